@@ -0,0 +1,45 @@
+"""
+Per-request authentication overhead of ``Auth.get_current_user`` with and
+without the verified-JWT claims cache.
+
+The user is served from the warm in-process tier of the user cache, so the
+numbers isolate token verification; no Redis or Postgres is needed.
+
+Usage::
+
+    python benchmarks/bench_auth_overhead.py --requests 100000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.services.auth import Auth
+from src.services.cache import CachedUser, ClaimsCache
+
+
+async def measure(auth: Auth, token: str, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await auth.get_current_user(token=token, db=None)
+    return (time.perf_counter() - started) / requests * 1_000_000
+
+
+async def main(args):
+    auth = Auth()
+    auth.SECRET_KEY, auth.ALGORITHM = "bench-secret", "HS256"
+    auth.user_cache._set_local(CachedUser(1, "bench", "bench@bench.local", None, None, True))
+    token = await auth.create_access_token(data={"sub": "bench@bench.local"})
+
+    for label, size in (("without cache", 0), ("with cache", 4096)):
+        auth.claims_cache = ClaimsCache(size)
+        print(f"{label:14} {await measure(auth, token, args.requests):8.2f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auth overhead per request")
+    parser.add_argument("--requests", type=int, default=100_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,146 @@
+"""
+Batch contact endpoints against the per-item routes they replace.
+
+Seeds one user with ``--items`` contacts, then reads, updates and deletes
+all of them once through ``/contacts/{id}``, ``/contacts/{id}/update`` and
+``DELETE /contacts/{id}`` (``--concurrency`` requests at a time), and once
+through ``/contacts/batch/get``, ``/contacts/batch/update`` and
+``/contacts/batch/delete`` in chunks of ``contacts_batch_size``. Requests go
+through the real app in-process, with authentication and rate limits
+bypassed so the numbers show the database and serialization cost.
+
+Usage::
+
+    python benchmarks/bench_batch.py --items 1000
+    python benchmarks/bench_batch.py --url sqlite+aiosqlite:///batch.db --fake-redis --concurrency 1
+
+SQLite allows one writer at a time, so run per-item writes against it
+with ``--concurrency 1``.
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+async def seed(Session, items: int) -> tuple[object, list[int]]:
+    from sqlalchemy import insert, select
+    from src.db.models import Contact, User
+
+    run_id = uuid.uuid4().hex[:8]
+    async with Session() as db:
+        user = User(username=f"batch{run_id}", email=f"batch-{run_id}@example.com", password="x", confirmed=True)
+        db.add(user)
+        await db.flush()
+        await db.execute(insert(Contact), [
+            dict(name=f"Name{n}", lastname="Batch", email=f"c{n}.{run_id}@example.com", phone=f"+38050{n:07d}",
+                 birthday=date(1990, 3, 11), birthday_md=311, additional="", contact_date=datetime.now(), user_id=user.id)
+            for n in range(items)
+        ])
+        ids = (await db.scalars(select(Contact.id).filter(Contact.user_id == user.id).order_by(Contact.id))).all()
+        await db.commit()
+    return user, ids
+
+
+async def per_item(client: httpx.AsyncClient, requests: list[tuple[str, str, dict]], concurrency: int) -> float:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(method, path, kwargs):
+        async with slots:
+            response = await client.request(method, path, **kwargs)
+            assert response.status_code < 400, response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(*request) for request in requests))
+    return time.perf_counter() - started
+
+
+async def batched(client: httpx.AsyncClient, method: str, path: str, bodies: list[dict]) -> float:
+    started = time.perf_counter()
+    for body in bodies:
+        response = await client.request(method, path, json=body)
+        assert response.status_code == 200, response.text
+    return time.perf_counter() - started
+
+
+def chunks(values: list, size: int) -> list[list]:
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+async def main(args):
+    from sqlalchemy import delete
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    from main import app, get_read_db
+    from src.conf.config import settings
+    from src.db.db import Base, async_engine, get_async_db
+    from src.db.models import User
+    from src.services import cache
+    from src.services.auth import auth_service
+
+    engine = create_async_engine(args.url) if args.url else async_engine
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_bench_db():
+        async with Session() as db:
+            yield db
+
+    if args.fake_redis:
+        from fakeredis import FakeAsyncRedis
+        cache.contacts_cache.__init__(FakeAsyncRedis(), cache.contacts_cache.ttl)
+    settings.rate_limit_enabled = False
+    app.dependency_overrides[get_async_db] = get_bench_db
+    app.dependency_overrides[get_read_db] = get_bench_db
+    size = settings.contacts_batch_size
+    transport = httpx.ASGITransport(app=app)
+    print(f"{args.items} contacts, per-item concurrency {args.concurrency}, batches of {size}")
+    print(f"{'operation':10} {'per item s':>11} {'batch s':>9} {'speedup':>8}")
+    users = []
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://batch") as client:
+            for operation in ("read", "update", "delete"):
+                timings = []
+                for mode in ("per_item", "batch"):
+                    user, ids = await seed(Session, args.items)
+                    users.append(user.id)
+                    app.dependency_overrides[auth_service.get_current_user] = lambda user=user: user
+                    if operation == "read":
+                        timings.append(await per_item(client, [("GET", f"/contacts/{id}", {}) for id in ids], args.concurrency)
+                                       if mode == "per_item" else
+                                       await batched(client, "POST", "/contacts/batch/get", [{"ids": chunk} for chunk in chunks(ids, size)]))
+                    elif operation == "update":
+                        timings.append(await per_item(client, [("PATCH", f"/contacts/{id}/update", {"json": {"additional": "updated"}})
+                                                               for id in ids], args.concurrency)
+                                       if mode == "per_item" else
+                                       await batched(client, "PATCH", "/contacts/batch/update",
+                                                     [{"items": [{"id": id, "additional": "updated"} for id in chunk]}
+                                                      for chunk in chunks(ids, size)]))
+                    else:
+                        timings.append(await per_item(client, [("DELETE", f"/contacts/{id}", {}) for id in ids], args.concurrency)
+                                       if mode == "per_item" else
+                                       await batched(client, "POST", "/contacts/batch/delete", [{"ids": chunk} for chunk in chunks(ids, size)]))
+                print(f"{operation:10} {timings[0]:11.3f} {timings[1]:9.3f} {timings[0] / timings[1]:7.1f}x")
+    finally:
+        async with Session() as db:
+            await db.execute(delete(User).where(User.id.in_(users)))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch vs per-item contact routes")
+    parser.add_argument("--url", help="async database URL, defaults to the app database")
+    parser.add_argument("--fake-redis", action="store_true", help="use an in-process fakeredis for the contacts cache")
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
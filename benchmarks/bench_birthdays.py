@@ -0,0 +1,98 @@
+"""
+Upcoming-birthdays query: ``extract('doy', birthday)`` full scan versus the
+indexed ``(user_id, birthday_md)`` range scan.
+
+Seeds one user with ``--contacts`` random contacts (plus ``--noise-users``
+users sharing the table) into the Postgres instance configured in
+``src/db/db.py``, which must be migrated with ``alembic upgrade head``.
+
+Usage::
+
+    python benchmarks/bench_birthdays.py --contacts 1000000 --runs 20
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert, select, delete, text
+from sqlalchemy.sql import extract, expression, or_
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.db.db import engine, SessionLocal
+from src.db.models import Contact, User, month_day
+from src.repository.contacts import birthday_window
+
+BATCH = 10_000
+
+
+def seed(db, contacts: int, users: int) -> int:
+    owners = []
+    for n in range(users):
+        user = User(username=f"bench{n}", email=f"bench{n}@bench.local", password="x", confirmed=True)
+        db.add(user)
+        db.flush()
+        owners.append(user.id)
+    now = datetime.now()
+    rows = []
+    for n in range(contacts):
+        birthday = date(1970, 1, 1) + timedelta(days=random.randrange(365 * 40))
+        rows.append(dict(name=f"n{n}", lastname=f"l{n}", email=f"c{n}@bench.local", phone=f"+{n:012d}",
+                         birthday=birthday, birthday_md=month_day(birthday), additional="",
+                         contact_date=now, user_id=owners[n % users]))
+        if len(rows) == BATCH:
+            db.execute(insert(Contact), rows)
+            rows.clear()
+    if rows:
+        db.execute(insert(Contact), rows)
+    db.commit()
+    db.execute(text("ANALYZE contacts"))
+    return owners[0]
+
+
+def doy_query(user_id: int, today: date):
+    today_doy = today.timetuple().tm_yday
+    return select(Contact).filter(Contact.user_id == user_id, or_(
+        expression.between(extract('doy', Contact.birthday), today_doy, today_doy + 6),
+    ))
+
+
+def md_query(user_id: int, today: date):
+    start_md, end_md = birthday_window(today, 7)
+    if start_md <= end_md:
+        condition = Contact.birthday_md.between(start_md, end_md)
+    else:
+        condition = or_(Contact.birthday_md >= start_md, Contact.birthday_md <= end_md)
+    return select(Contact).filter(Contact.user_id == user_id, condition)
+
+
+def measure(db, stmt, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        db.execute(stmt).scalars().all()
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def main(args):
+    with SessionLocal() as db:
+        user_id = seed(db, args.contacts, args.noise_users + 1)
+        try:
+            today = date.today()
+            for label, stmt in (("extract(doy)", doy_query(user_id, today)), ("birthday_md", md_query(user_id, today))):
+                compiled = stmt.compile(engine, compile_kwargs={"literal_binds": True})
+                plan = db.execute(text(f"EXPLAIN {compiled}")).scalars().all()
+                print(f"{label:13} {measure(db, stmt, args.runs):8.2f} ms/query  plan: {plan[0]}")
+        finally:
+            db.execute(delete(User).where(User.email.like("bench%@bench.local")))
+            db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upcoming-birthdays query benchmark")
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--noise-users", type=int, default=9)
+    parser.add_argument("--runs", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,71 @@
+"""
+Concurrent request throughput of the sync ``get_db`` dependency versus the
+async ``get_async_db`` dependency.
+
+Both routes are ``async def`` handlers running the same slow query
+(``pg_sleep``), which is how the contact handlers used the sync session.
+Requires the Postgres instance configured in ``src/db/db.py``.
+
+Usage::
+
+    python benchmarks/bench_db_dependency.py --requests 200 --concurrency 50 --delay 0.05
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.db.db import get_db, get_async_db
+
+app = FastAPI()
+
+
+@app.get("/sync")
+async def sync_route(delay: float, db: Session = Depends(get_db)):
+    db.execute(text("SELECT pg_sleep(:d)"), {"d": delay})
+    return {"ok": True}
+
+
+@app.get("/async")
+async def async_route(delay: float, db: AsyncSession = Depends(get_async_db)):
+    await db.execute(text("SELECT pg_sleep(:d)"), {"d": delay})
+    return {"ok": True}
+
+
+async def run(path: str, requests: int, concurrency: int, delay: float) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one():
+            async with semaphore:
+                response = await client.get(path, params={"delay": delay})
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return time.perf_counter() - started
+
+
+async def main(args):
+    for path in ("/sync", "/async"):
+        elapsed = await run(path, args.requests, args.concurrency, args.delay)
+        print(f"{path:7} {args.requests} requests, concurrency {args.concurrency}: "
+              f"{elapsed:.2f}s, {args.requests / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync vs async DB dependency throughput")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds each query sleeps")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Email throughput of the pooled ``MailSender`` versus one SMTP connection per
+message (what ``FastMail.send_message`` did), against a local aiosmtpd server.
+
+Requires ``aiosmtpd``.
+
+Usage::
+
+    python benchmarks/bench_email.py --messages 10000 --pool-size 4
+"""
+import argparse
+import asyncio
+import socket
+import sys
+import time
+from pathlib import Path
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.services.email import MailSender
+
+
+class Sink:
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def body(n: int) -> dict:
+    return {"host": "http://localhost:8000/", "username": f"user{n}", "token": "x" * 150}
+
+
+async def pooled(sender: MailSender, messages: int) -> None:
+    await asyncio.gather(*(sender.send(f"user{n}@bench.local", "Confirm your email", "email_template.html", body(n))
+                           for n in range(messages)))
+    await sender.stop()
+
+
+async def per_message(sender: MailSender, port: int, messages: int, concurrency: int) -> None:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(n: int):
+        async with slots:
+            sender.templates.cache.clear()
+            message = sender.message(f"user{n}@bench.local", "Confirm your email", "email_template.html", body(n))
+            await aiosmtplib.send(message, hostname="127.0.0.1", port=port)
+
+    await asyncio.gather(*(one(n) for n in range(messages)))
+
+
+async def main(args):
+    sink = Sink()
+    port = free_port()
+    controller = Controller(sink, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        options = dict(hostname="127.0.0.1", port=port, username=None, password=None,
+                       from_address="noreply@bench.local", from_name="Bench", use_tls=False)
+        runs = (
+            ("per message", lambda: per_message(MailSender(**options), port, args.messages, args.pool_size)),
+            ("pooled", lambda: pooled(MailSender(**options, pool_size=args.pool_size), args.messages)),
+        )
+        for label, run in runs:
+            started = time.perf_counter()
+            await run()
+            elapsed = time.perf_counter() - started
+            print(f"{label:12} {args.messages} messages: {elapsed:.2f}s, {args.messages / elapsed:.0f} msg/s")
+    finally:
+        controller.stop()
+    print(f"received {sink.received}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Email send throughput")
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--pool-size", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
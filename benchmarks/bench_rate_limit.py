@@ -0,0 +1,55 @@
+"""
+Per-request overhead of the token-bucket rate limiter.
+
+Measures a request that Redis allows (one EVALSHA round trip), and one
+rejected by the in-process block without touching Redis. Needs the Redis
+server from the settings or ``--url``.
+
+Usage::
+
+    python benchmarks/bench_rate_limit.py --requests 20000
+    python benchmarks/bench_rate_limit.py --url redis://localhost:6379/1
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from redis.asyncio import Redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.conf.config import settings
+from src.services.rate_limit import RateLimiter
+
+
+async def measure(limiter: RateLimiter, key: str, rate: float, capacity: int, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await limiter.hit(key, rate, capacity)
+    return (time.perf_counter() - started) / requests * 1_000_000
+
+
+async def main(args):
+    redis = Redis.from_url(args.url) if args.url else Redis(host=settings.redis_host, port=settings.redis_port)
+    limiter = RateLimiter(redis, prefix=f"bench:{uuid.uuid4().hex[:8]}:")
+    try:
+        allowed = await measure(limiter, "allowed", args.requests, args.requests, args.requests)
+        await limiter.hit("rejected", 1 / 3600, 1)
+        await limiter.hit("rejected", 1 / 3600, 1)
+        rejected = await measure(limiter, "rejected", 1 / 3600, 1, args.requests)
+        print(f"{'allowed (Redis)':22} {allowed:8.2f} us/request")
+        print(f"{'rejected (in-process)':22} {rejected:8.2f} us/request")
+        print(limiter.stats())
+    finally:
+        await redis.delete(*[limiter.prefix + key for key in ("allowed", "rejected")])
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate limiter overhead")
+    parser.add_argument("--url", help="Redis URL, defaults to redis_host and redis_port from the settings")
+    parser.add_argument("--requests", type=int, default=20_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,97 @@
+"""
+Latency of ``/contacts/search`` queries for a user with many contacts.
+
+Runs against the async engine from ``src/db/db.py`` (Postgres, migrated
+with ``alembic upgrade head``) or, with ``--url sqlite+aiosqlite:///path``,
+against the SQLite FTS5 stand-in, whose schema is created on the fly.
+
+Usage::
+
+    python benchmarks/bench_search.py --contacts 100000 --runs 50
+    python benchmarks/bench_search.py --url sqlite+aiosqlite:///search.db
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import string
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+from sqlalchemy import insert, delete
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.db.db import Base, async_engine
+from src.db.models import Contact, User, month_day
+from src.repository.contacts import search_contacts
+
+BATCH = 5_000
+QUERIES = {
+    "prefix": lambda name: name[:3],
+    "full": lambda name: name,
+    "typo": lambda name: name[:-2] + random.choice(string.ascii_lowercase) + name[-1],
+    "phone": lambda name: "0501",
+}
+
+
+def word() -> str:
+    return random.choice(string.ascii_uppercase) + "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9)))
+
+
+async def seed(db, contacts: int) -> tuple[int, list[str]]:
+    user = User(username="bench", email="bench@bench.local", password="x", confirmed=True)
+    db.add(user)
+    await db.flush()
+    names, rows = [], []
+    birthday = date(1990, 5, 1)
+    for n in range(contacts):
+        name, lastname = word(), word()
+        names.append(lastname.lower())
+        rows.append(dict(name=name, lastname=lastname, email=f"{name.lower()}.{n}@bench.local",
+                         phone=f"+38050{n:07d}", birthday=birthday, birthday_md=month_day(birthday),
+                         additional="", contact_date=datetime.now(), user_id=user.id))
+        if len(rows) == BATCH:
+            await db.execute(insert(Contact), rows)
+            rows.clear()
+    if rows:
+        await db.execute(insert(Contact), rows)
+    await db.commit()
+    return user.id, names
+
+
+async def main(args):
+    engine = create_async_engine(args.url) if args.url else async_engine
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as db:
+        user_id, names = await seed(db, args.contacts)
+        try:
+            for label, make_query in QUERIES.items():
+                timings = []
+                for _ in range(args.runs):
+                    q = make_query(random.choice(names))
+                    started = time.perf_counter()
+                    await search_contacts(user_id, q, 20, 0, db)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                print(f"{label:7} p50 {statistics.median(timings):7.2f} ms  "
+                      f"p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms")
+        finally:
+            await db.execute(delete(Contact).where(Contact.user_id == user_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Contact search latency")
+    parser.add_argument("--url", help="async database URL, defaults to the app database")
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
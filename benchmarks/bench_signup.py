@@ -0,0 +1,84 @@
+"""
+Signup throughput of the previous lookup + insert + refresh flow against
+the single ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` in
+``repository.users.create_user``.
+
+Passwords are pre-hashed so the numbers isolate database round trips and
+avatar URL generation from bcrypt. Runs against the async engine from
+``src/db/db.py`` or, with ``--url``, any other async database URL.
+
+Usage::
+
+    python benchmarks/bench_signup.py --users 2000 --concurrency 20
+    python benchmarks/bench_signup.py --url sqlite+aiosqlite:///signup.db
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from libgravatar import Gravatar
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.db.db import Base, async_engine
+from src.db.models import User
+from src.repository.users import create_user
+from src.schemas import UserModel
+
+
+async def legacy_signup(body: UserModel, db) -> User | None:
+    result = await db.execute(select(User).filter(User.email == body.email))
+    if result.scalar_one_or_none():
+        return None
+    new_user = User(**body.dict(), avatar=Gravatar(body.email).get_image())
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+
+async def run(Session, signup, prefix: str, users: int, concurrency: int) -> float:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(n: int):
+        body = UserModel(username=f"bench{n:05d}", email=f"{prefix}{n}@bench.local", password="hashed")
+        async with slots, Session() as db:
+            await signup(body, db)
+
+    started = time.perf_counter()
+    async with asyncio.TaskGroup() as tasks:
+        for n in range(users):
+            tasks.create_task(one(n))
+    return users / (time.perf_counter() - started)
+
+
+async def main(args):
+    engine = create_async_engine(args.url) if args.url else async_engine
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    run_id = uuid.uuid4().hex[:8]
+    try:
+        for label, signup in (("before", legacy_signup), ("after", create_user)):
+            prefix = f"{label}-{run_id}-"
+            rate = await run(Session, signup, prefix, args.users, args.concurrency)
+            print(f"{label:7} {rate:9.1f} signups/s")
+    finally:
+        async with Session() as db:
+            await db.execute(delete(User).where(User.email.like(f"%-{run_id}-%")))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Signup throughput")
+    parser.add_argument("--url", help="async database URL, defaults to the app database")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""
+Cold start of the API: import time, lifespan startup and first response.
+
+Every run is a fresh interpreter, so nothing is cached in-process between
+runs (the OS file cache still is, run once before measuring). Each run also
+counts the sockets opened while importing, which should be zero: engines
+and Redis connect on first use and the schema is left to Alembic.
+
+With ``--importtime`` one more run is made under ``python -X importtime``
+and the slowest imports are listed.
+
+Usage::
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --module src.db.models --importtime
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import json, socket, sys, time, warnings
+warnings.simplefilter("ignore")
+connects = []
+_connect = socket.socket.connect
+def connect(self, address):
+    connects.append(str(address))
+    return _connect(self, address)
+socket.socket.connect = connect
+started = time.perf_counter()
+module = __import__({module!r}, fromlist=["*"])
+imported = time.perf_counter()
+result = {{"import": imported - started, "connects_on_import": connects[:]}}
+app = getattr(module, "app", None)
+if app is not None:
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        result["startup"] = time.perf_counter() - imported
+        response = client.get({path!r})
+        result["first_response"] = time.perf_counter() - started
+        result["status"] = response.status_code
+print(json.dumps(result))
+"""
+
+
+def run_once(module: str, path: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", CHILD.format(module=module, path=path)], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int) -> list[tuple[int, int, str]]:
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), int(own), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(args):
+    results = [run_once(args.module, args.path) for _ in range(args.runs)]
+    print(f"{args.module}, {args.runs} cold starts")
+    for key in ("import", "startup", "first_response"):
+        values = [r[key] for r in results if key in r]
+        if values:
+            print(f"{key:16} median {statistics.median(values) * 1000:8.1f} ms   min {min(values) * 1000:8.1f} ms")
+    connects = sorted({c for r in results for c in r["connects_on_import"]})
+    print("connections opened on import:", ", ".join(connects) if connects else "none")
+    if "status" in results[-1]:
+        print(f"GET {args.path}: {results[-1]['status']}")
+    if args.importtime:
+        print(f"\n{'cumulative ms':>14} {'self ms':>9}  module")
+        for cumulative, own, name in slowest_imports(args.module, args.top):
+            print(f"{cumulative / 1000:14.1f} {own / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--module", default="main", help="module to import, its `app` is started if it has one")
+    parser.add_argument("--path", default="/metrics", help="route requested once the app has started")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="list the slowest imports")
+    parser.add_argument("--top", type=int, default=20)
+    main(parser.parse_args())
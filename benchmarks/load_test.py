@@ -0,0 +1,336 @@
+"""
+Load test of the API routes with a JSON baseline and a regression check.
+
+Seeds ``--users`` confirmed users with ``--contacts`` contacts each, then
+drives every scenario below through the real app (in-process, over
+``httpx.ASGITransport``) at a fixed concurrency, and records p50/p95/p99
+latency and requests/s per scenario.
+
+The database is the app's Postgres unless ``--url`` is given; with an
+SQLite URL the schema is created on the fly. Redis is the one from the
+settings unless ``--fake-redis`` is given, which runs on an in-process
+fakeredis (with lupa for the Lua scripts). Rate limiting is switched off
+and bcrypt uses ``--bcrypt-rounds`` so the numbers reflect the app, not
+the limits.
+
+Usage::
+
+    python benchmarks/load_test.py --out baseline.json
+    python benchmarks/load_test.py --compare baseline.json --tolerance 0.2
+    python benchmarks/load_test.py --url sqlite+aiosqlite:///load.db --fake-redis --users 20 --contacts 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def word() -> str:
+    return random.choice(string.ascii_uppercase) + "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9)))
+
+
+def random_birthday(today: date) -> date:
+    day = today + timedelta(days=random.randint(0, 364))
+    # Feb 29 needs a leap year; 1960 is one, so every 4th year from it is too.
+    year = random.randrange(1960, 2005, 4) if (day.month, day.day) == (2, 29) else random.randint(1960, 2005)
+    return day.replace(year=year)
+
+
+class Seeded:
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.users: list[dict] = []
+        self.signups = 0
+
+
+async def seed(Session, args, run_id: str, password_hash: str) -> Seeded:
+    from sqlalchemy import insert, select
+    from src.db.models import Contact, User, month_day
+    from src.services.auth import auth_service
+
+    seeded = Seeded(run_id)
+    today = date.today()
+    async with Session() as db:
+        for u in range(args.users):
+            email = f"load-{run_id}-{u}@example.com"
+            user = User(username=f"load{u:05d}", email=email, password=password_hash, confirmed=True)
+            db.add(user)
+            await db.flush()
+            rows = []
+            for n in range(args.contacts):
+                birthday = random_birthday(today)
+                name, lastname = word(), word()
+                rows.append(dict(name=name, lastname=lastname, email=f"{name.lower()}.{n}@example.com",
+                                 phone=f"+38050{n:07d}", birthday=birthday, birthday_md=month_day(birthday),
+                                 additional="", contact_date=datetime.now(), user_id=user.id))
+            if rows:
+                await db.execute(insert(Contact), rows)
+            sample = (await db.scalars(select(Contact).filter(Contact.user_id == user.id).limit(50))).all()
+            seeded.users.append({
+                "id": user.id,
+                "email": email,
+                "access_token": await auth_service.create_access_token(data={"sub": email}),
+                "refresh_token": None,
+                "contacts": [(c.id, c.name, c.lastname, c.email) for c in sample],
+            })
+        await db.commit()
+    return seeded
+
+
+def scenarios(seeded: Seeded, password: str) -> dict:
+
+    """
+    Request factories by scenario name; each returns the request arguments for one call.
+    """
+
+    def auth(user: dict) -> dict:
+        return {"Authorization": f"Bearer {user['access_token']}"}
+
+    def contact_route(path: str, field: int):
+        def make():
+            user = random.choice(seeded.users)
+            contact = random.choice(user["contacts"])
+            return "GET", path.format(contact[field]), {"headers": auth(user)}
+        return make
+
+    def contacts_conditional():
+        user = random.choice(seeded.users)
+        headers = auth(user)
+        if user.get("etag"):
+            headers["If-None-Match"] = user["etag"]
+        return "GET", "/contacts", {"headers": headers, "params": {"limit": 100}}
+
+    def login():
+        user = random.choice(seeded.users)
+        return "POST", "/api/auth/login", {"data": {"username": user["email"], "password": password}}
+
+    def signup():
+        seeded.signups += 1
+        return "POST", "/api/auth/signup", {"json": {"username": f"s{seeded.signups:07d}"[:16],
+                                                     "email": f"load-{seeded.run_id}-s{seeded.signups}@example.com",
+                                                     "password": password}}
+
+    return {
+        "contacts_page": lambda: ("GET", "/contacts", {"headers": auth(random.choice(seeded.users)), "params": {"limit": 100}}),
+        "contacts_conditional": contacts_conditional,
+        "birthdays": lambda: ("GET", "/birthdays", {"headers": auth(random.choice(seeded.users)), "params": {"days": 7}}),
+        "contact_by_id": contact_route("/contacts/{}", 0),
+        "contact_by_name": contact_route("/contacts/name/{}", 1),
+        "contact_by_lastname": contact_route("/contacts/lastname/{}", 2),
+        "contact_by_email": contact_route("/contacts/email/{}", 3),
+        "search": lambda: ("GET", "/contacts/search", {"headers": auth(random.choice(seeded.users)),
+                                                       "params": {"q": random.choice(random.choice(seeded.users)["contacts"])[2][:4]}}),
+        "login": login,
+        "refresh": None,
+        "signup": signup,
+    }
+
+
+async def run_refresh(client: httpx.AsyncClient, seeded: Seeded, requests: int, concurrency: int) -> tuple[list, int, float]:
+
+    """
+    Refresh tokens rotate, so every user is used by one request at a time.
+    """
+
+    idle: asyncio.Queue = asyncio.Queue()
+    for user in seeded.users:
+        idle.put_nowait(user)
+    latencies, errors = [], 0
+
+    async def worker(count: int):
+        nonlocal errors
+        for _ in range(count):
+            user = await idle.get()
+            started = time.perf_counter()
+            response = await client.get("/api/auth/refresh_token",
+                                        headers={"Authorization": f"Bearer {user['refresh_token']}"})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code == 200:
+                user["refresh_token"] = response.json()["refresh_token"]
+            else:
+                errors += 1
+            idle.put_nowait(user)
+
+    workers = min(concurrency, len(seeded.users))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(requests // workers + (i < requests % workers)) for i in range(workers)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run(client: httpx.AsyncClient, make, requests: int, concurrency: int, on_response=None) -> tuple[list, int, float]:
+    latencies, errors = [], 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        method, path, kwargs = make()
+        async with slots:
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+        elif on_response:
+            on_response(kwargs, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+
+    """
+    Scenarios whose p95 grew or whose throughput dropped by more than ``tolerance``.
+    """
+
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        if now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if now["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {before['rps']} -> {now['rps']} requests/s")
+        if now["errors"] > before["errors"]:
+            regressions.append(f"{name}: {before['errors']} -> {now['errors']} errors")
+    return regressions
+
+
+def use_redis(redis) -> None:
+    from src.routes import auth as auth_routes
+    from src.services import cache, rate_limit
+    from src.services.queue import JobQueue
+
+    cache.user_cache.redis = redis
+    cache.contacts_cache.__init__(redis, cache.contacts_cache.ttl)
+    rate_limit.rate_limiter.__init__(redis)
+    auth_routes.job_queue = JobQueue(redis, "load-test-jobs")
+
+
+async def main(args):
+    os.environ.setdefault("PASSWORD_HASH_ROUNDS", str(args.bcrypt_rounds))
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    from sqlalchemy import delete, select
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from redis.asyncio import Redis
+
+    from main import app, get_read_db
+    from src.db.db import Base, async_engine, get_async_db
+    from src.db.models import Contact, User
+    from src.services.passwords import _hash
+
+    engine = create_async_engine(args.url) if args.url else async_engine
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_bench_db():
+        async with Session() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_bench_db
+    app.dependency_overrides[get_read_db] = get_bench_db
+    if args.fake_redis:
+        from fakeredis import FakeAsyncRedis
+        use_redis(FakeAsyncRedis())
+    else:
+        use_redis(Redis.from_url(args.redis) if args.redis else Redis(host=os.environ.get("REDIS_HOST", "localhost")))
+
+    run_id = uuid.uuid4().hex[:8]
+    password = "secret1"
+    seeded = await seed(Session, args, run_id, _hash(password))
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+            for name, make in scenarios(seeded, password).items():
+                if args.only and name not in args.only:
+                    continue
+                if name == "refresh":
+                    for user in seeded.users:
+                        response = await client.post("/api/auth/login",
+                                                     data={"username": user["email"], "password": password})
+                        user["refresh_token"] = response.json()["refresh_token"]
+                    latencies, errors, elapsed = await run_refresh(client, seeded, args.requests, args.concurrency)
+                else:
+                    def remember_etag(kwargs, response, users={u["access_token"]: u for u in seeded.users}):
+                        token = kwargs.get("headers", {}).get("Authorization", "")[7:]
+                        if "ETag" in response.headers and token in users:
+                            users[token]["etag"] = response.headers["ETag"]
+
+                    await run(client, make, min(args.concurrency, args.requests), args.concurrency, remember_etag)
+                    latencies, errors, elapsed = await run(client, make, args.requests, args.concurrency, remember_etag)
+                results[name] = summarize(latencies, errors, elapsed)
+                r = results[name]
+                print(f"{name:22} {r['rps']:9.1f} req/s  p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  "
+                      f"p99 {r['p99_ms']:8.2f} ms  errors {r['errors']}")
+    finally:
+        async with Session() as db:
+            users = select(User.id).filter(User.email.like(f"load-{run_id}-%"))
+            await db.execute(delete(Contact).where(Contact.user_id.in_(users)))
+            await db.execute(delete(User).where(User.email.like(f"load-{run_id}-%")))
+            await db.commit()
+        await engine.dispose()
+
+    report = {
+        "meta": {"users": args.users, "contacts": args.contacts, "requests": args.requests,
+                 "concurrency": args.concurrency, "database": engine.dialect.name,
+                 "python": platform.python_version(), "created_at": datetime.now().isoformat(timespec="seconds")},
+        "scenarios": results,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text()), report, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API load test")
+    parser.add_argument("--url", help="async database URL, defaults to the app database")
+    parser.add_argument("--redis", help="Redis URL, defaults to redis_host from the settings")
+    parser.add_argument("--fake-redis", action="store_true", help="use an in-process fakeredis instead of Redis")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--contacts", type=int, default=1000, help="contacts per user")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare with; exits with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change, 0.2 = 20%%")
+    asyncio.run(main(parser.parse_args()))
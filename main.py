@@ -1,24 +1,59 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import List
-from fastapi import FastAPI, Depends, HTTPException, status, Path
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
-from src.db.db import get_db
+from fastapi import FastAPI, Depends, HTTPException, status, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from src.db.db import get_db, get_async_db, get_replica_db, engine, async_engine, replica_engine
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from sqlalchemy.sql import extract, expression, or_
+from sqlalchemy.exc import IntegrityError
 from src.db.models import Contact, User
-from src.schemas import ContactModel, ContactResponse, UpdateModel
+from src.schemas import ContactModel, ContactResponse, UpdateModel, ImportReport, BatchIds, BatchUpdate, BatchResult
 from datetime import datetime, timedelta, date
 from src.routes import auth
 from src.routes import users
+from src.repository import contacts as repository_contacts
 from src.services.auth import auth_service
-import redis.asyncio as redis
+from src.services import contacts_io
+from src.services.cache import contacts_cache, redis_client
+from src.services.queue import job_queue
+from src.services.avatars import avatar_pipeline
+from src.services.rate_limit import UserRateLimit, rate_limiter
+from src.services import metrics, profiling
 from src.conf.config import settings
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+
+    """
+    Starts the user cache invalidation listener and releases pools and connections on shutdown.
+
+    Importing the app opens no connections: engines and the Redis client
+    connect on first use, and the schema is managed by Alembic only. Emails
+    are sent by the job worker, so the API process has no SMTP pool.
+    """
+
+    cache_listener = asyncio.create_task(auth_service.user_cache.listen())
+    try:
+        yield
+    finally:
+        cache_listener.cancel()
+        auth_service.password_pool.shutdown()
+        avatar_pipeline.shutdown()
+        await redis_client.aclose()
+        await async_engine.dispose()
+        if replica_engine is not None:
+            await replica_engine.dispose()
+        engine.dispose()
+        metrics.mark_process_dead()
+
+
+app = FastAPI(lifespan=lifespan)
 origins = [ 
     "http://localhost:3000"
     ]
@@ -29,9 +64,32 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+if settings.sql_profiling:
+    profiling.install(async_engine.sync_engine)
+    if replica_engine is not None:
+        profiling.install(replica_engine.sync_engine)
+    app.add_middleware(profiling.SQLProfilingMiddleware)
 
 app.include_router(auth.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
+if settings.avatar_storage == "local":
+    app.mount(settings.avatar_base_url, StaticFiles(directory=settings.avatar_local_dir, check_dir=False), name="avatars")
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+
+    """
+    Prometheus metrics of all worker processes.
+
+    :return: metrics in the Prometheus text format.
+    :rtype: Response
+    """
+
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
 
 @app.get("/api/healthchecker")
 def healthchecker(db: Session = Depends(get_db)):
@@ -45,25 +103,292 @@ def healthchecker(db: Session = Depends(get_db)):
         print(e)
         raise HTTPException(status_code=500, detail="Error connecting to the database")
 
-@app.get("/contacts", response_model = List[ContactResponse], tags = ['contacts'])
-async def get_contacts(current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@app.get("/api/healthchecker/cache")
+def cache_stats():
+
+    """
+    Hit and miss counters of the user and JWT claims caches used by get_current_user
+    and of the contacts response cache.
+
+    :return: counters.
+    :rtype: Dict
+    """
+
+    return {"user_cache": auth_service.user_cache.stats(), "jwt_cache": auth_service.claims_cache.stats(),
+            "contacts_cache": contacts_cache.stats()}
+
+
+@app.get("/api/healthchecker/password_pool")
+def password_pool_stats():
+
+    """
+    Concurrency and queueing counters of the bcrypt worker pool.
+
+    :return: counters.
+    :rtype: Dict
+    """
+
+    return auth_service.password_pool.stats()
+
+
+@app.get("/api/healthchecker/rate_limit")
+def rate_limit_stats():
+
+    """
+    Allowed and rejected request counters of the rate limiter in this process.
+
+    :return: counters.
+    :rtype: Dict
+    """
+
+    return rate_limiter.stats()
+
+
+@app.get("/api/healthchecker/queue")
+async def queue_stats():
+
+    """
+    Depth of the background job queue and counters summed over all workers.
+
+    :return: counters.
+    :rtype: Dict
+    """
+
+    return await job_queue.stats()
+
+
+contacts_read_limit = UserRateLimit("contacts_read")
+contacts_write_limit = UserRateLimit("contacts_write")
+contacts_search_limit = UserRateLimit("contacts_search")
+contacts_export_limit = UserRateLimit("contacts_export")
+contacts_import_limit = UserRateLimit("contacts_import")
+contacts_batch_limit = UserRateLimit("contacts_batch")
+
+
+async def get_read_db(current_user: User = Depends(auth_service.get_current_user)):
 
     """
-    Retrieves a list of all contacts from the database.
+    Yields a session for read-only contact routes.
+
+    Reads go to the replica, except for users who changed their contacts
+    within ``settings.db_replica_lag`` seconds, so they see their own writes.
 
+    :param current_user: curently logged user.
+    :type current_user: User
+    :return: The async database session.
+    :rtype: AsyncSession
+    """
+
+    recent = replica_engine is None or await contacts_cache.recently_written(current_user.id)
+    async for db in (get_async_db() if recent else get_replica_db()):
+        yield db
+
+
+@app.get("/contacts", response_model = List[ContactResponse], tags = ['contacts'], dependencies = [Depends(contacts_read_limit)])
+async def get_contacts(request: Request, limit: int = Query(100, ge = 1, le = 1000), after_id: int = Query(0, ge = 0),
+                       stream: bool = Query(False), current_user: User = Depends(auth_service.get_current_user),
+                       db: AsyncSession = Depends(get_read_db)):
+
+    """
+    Retrieves contacts page by page, ordered by id.
+
+    The next page starts after the id sent in the X-Next-After-Id header.
+    With stream=true all contacts after after_id are sent as NDJSON instead.
+    Pages carry an ETag and are served from the contacts cache until the
+    user's contacts change.
+
+    :param request: request, for its If-None-Match header.
+    :type request: Request
+    :param limit: page size.
+    :type limit: int
+    :param after_id: last contact id of the previous page.
+    :type after_id: int
+    :param stream: stream all contacts as NDJSON.
+    :type stream: bool
     :param current_user: curently logged user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A list of contacts.
-    :rtype: Query
+    :rtype: Response | StreamingResponse
+    """
+    if stream:
+        return StreamingResponse(contacts_io.to_ndjson(repository_contacts.stream_contact_batches(current_user.id, after_id)),
+                                 media_type="application/x-ndjson")
+
+    async def build():
+        contacts = await repository_contacts.get_contacts_page(current_user.id, limit, after_id, db)
+        headers = {"X-Next-After-Id": str(contacts[-1].id)} if len(contacts) == limit else {}
+        return contacts_io.to_json(contacts), headers
+
+    return await contacts_cache.respond(request, current_user.id, f"contacts?limit={limit}&after_id={after_id}", build)
+
+
+@app.get("/contacts/search", response_model = List[ContactResponse], tags = ['contacts'], dependencies = [Depends(contacts_search_limit)])
+async def search_contacts(q: str = Query(min_length = 1, max_length = 100), limit: int = Query(20, ge = 1, le = 100),
+                          offset: int = Query(0, ge = 0), current_user: User = Depends(auth_service.get_current_user),
+                          db: AsyncSession = Depends(get_read_db)):
+
+    """
+    Searches contacts by name, last name, email or phone, tolerating typos.
+
+    :param q: search text.
+    :type q: str
+    :param limit: page size.
+    :type limit: int
+    :param offset: number of results to skip.
+    :type offset: int
+    :param current_user: curently logged user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Contacts, best matches first.
+    :rtype: List[Contact]
+    """
+
+    return await repository_contacts.search_contacts(current_user.id, q, limit, offset, db)
+
+
+@app.get("/contacts/export", tags = ['contacts'], dependencies = [Depends(contacts_export_limit)])
+async def export_contacts(format: str = Query("csv", pattern = "^(csv|ndjson|vcard)$"), gzip: bool = Query(False),
+                          current_user: User = Depends(auth_service.get_current_user)):
+
+    """
+    Streams the whole address book as CSV, NDJSON or vCard, optionally gzipped.
+
+    Rows are read through a server-side cursor and formatted batch by batch,
+    so memory use and time to first byte don't depend on the number of contacts.
+
+    :param format: csv, ndjson or vcard.
+    :type format: str
+    :param gzip: gzip the file while streaming.
+    :type gzip: bool
+    :param current_user: curently logged user.
+    :type current_user: User
+    :return: The file.
+    :rtype: StreamingResponse
+    """
+
+    formatter, media_type, extension = contacts_io.formatters[format]
+    body = formatter(repository_contacts.stream_contact_batches(current_user.id))
+    filename = f"contacts.{extension}"
+    if gzip:
+        body, media_type, filename = contacts_io.gzip_stream(body), "application/gzip", filename + ".gz"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@app.post("/contacts/import", response_model = ImportReport, tags = ['contacts'], dependencies = [Depends(contacts_import_limit)])
+async def import_contacts(request: Request, format: str | None = Query(None, pattern = "^(csv|ndjson)$"),
+                          current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_async_db)):
+
+    """
+    Imports contacts from a CSV (with a header line) or NDJSON request body.
+
+    The body is parsed while it is being received and written in batches,
+    so the file is never held in memory as a whole.
+
+    :param request: request with the file as its body.
+    :type request: Request
+    :param format: csv or ndjson, detected from Content-Type when omitted.
+    :type format: str | None
+    :param current_user: curently logged user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Import report.
+    :rtype: ImportReport
+    """
+
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    rows = contacts_io.parsers[format](contacts_io.iter_lines(request.stream()))
+    try:
+        return await repository_contacts.import_contacts(current_user.id, rows, db)
+    finally:
+        # Batches are committed as they go, so even a failed import may have added contacts.
+        await contacts_cache.bump(current_user.id)
+
+
+@app.post("/contacts/batch/get", response_model = BatchResult, tags = ['contacts'], dependencies = [Depends(contacts_batch_limit)])
+async def get_contacts_batch(body: BatchIds, current_user: User = Depends(auth_service.get_current_user),
+                             db: AsyncSession = Depends(get_read_db)):
+
+    """
+    Retrieves up to contacts_batch_size contacts by id in one query.
+
+    :param body: contact ids.
+    :type body: BatchIds
+    :param current_user: curently logged user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: status 200 and the contact, or 404, for every id in request order.
+    :rtype: Dict
+    """
+
+    found = {contact.id: contact for contact in await repository_contacts.get_contacts_by_ids(current_user.id, body.ids, db)}
+    return {"results": [{"id": id, "status": 200, "contact": found[id]} if id in found else {"id": id, "status": 404}
+                        for id in body.ids]}
+
+
+@app.patch("/contacts/batch/update", response_model = BatchResult, tags = ['contacts'], dependencies = [Depends(contacts_batch_limit)])
+async def update_contacts_batch(body: BatchUpdate, current_user: User = Depends(auth_service.get_current_user),
+                                db: AsyncSession = Depends(get_async_db)):
+
+    """
+    Partially updates up to contacts_batch_size contacts in one UPDATE statement.
+
+    The batch is applied in one transaction: if any new email or phone
+    clashes with another contact nothing is updated.
+
+    :param body: the fields to change of every contact, with its id.
+    :type body: BatchUpdate
+    :param current_user: curently logged user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: status 200 and the updated contact, or 404, for every item in request order.
+    :rtype: Dict
     """
-    contacts = db.query(Contact).filter(Contact.user_id == current_user.id)
-    return contacts
+
+    items = [item.model_dump(exclude_unset=True, exclude_none=True) for item in body.items]
+    try:
+        updated = {contact.id: contact for contact in await repository_contacts.update_contacts(current_user.id, items, db)}
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email or phone already exists")
+    if updated:
+        await contacts_cache.bump(current_user.id)
+    return {"results": [{"id": item.id, "status": 200, "contact": updated[item.id]} if item.id in updated
+                        else {"id": item.id, "status": 404} for item in body.items]}
 
 
-@app.get("/contacts/{contact_id}", response_model = ContactResponse, tags = ['contacts'])
-async def get_contact(contact_id: int = Path(ge = 1), current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@app.post("/contacts/batch/delete", response_model = BatchResult, tags = ['contacts'], dependencies = [Depends(contacts_batch_limit)])
+async def remove_contacts_batch(body: BatchIds, current_user: User = Depends(auth_service.get_current_user),
+                                db: AsyncSession = Depends(get_async_db)):
+
+    """
+    Deletes up to contacts_batch_size contacts in one DELETE statement.
+
+    :param body: contact ids.
+    :type body: BatchIds
+    :param current_user: curently logged user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: status 204, or 404, for every id in request order.
+    :rtype: Dict
+    """
+
+    deleted = set(await repository_contacts.remove_contacts(current_user.id, body.ids, db))
+    if deleted:
+        await contacts_cache.bump(current_user.id)
+    return {"results": [{"id": id, "status": 204 if id in deleted else 404} for id in body.ids]}
+
+
+@app.get("/contacts/{contact_id}", response_model = ContactResponse, tags = ['contacts'], dependencies = [Depends(contacts_read_limit)])
+async def get_contact(contact_id: int = Path(ge = 1), current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_read_db)):
 
     """
     Retrieves a contact by given id from the database.
@@ -73,19 +398,20 @@ async def get_contact(contact_id: int = Path(ge = 1), current_user: User = Depen
     :param current_user: curently logged user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contact.
     :rtype: Contact | None
     """
 
-    contact = db.query(Contact).filter_by(id=contact_id, user_id = current_user.id).first()
+    result = await db.execute(repository_contacts.contact_lookup(current_user.id, id=contact_id))
+    contact = result.scalars().first()
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     return contact
 
 
-@app.get("/contacts/name/{nm}", response_model = ContactResponse, tags = ['contacts'])
-async def get_contact_by_name(nm: str = Path(),  current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@app.get("/contacts/name/{nm}", response_model = ContactResponse, tags = ['contacts'], dependencies = [Depends(contacts_read_limit)])
+async def get_contact_by_name(nm: str = Path(),  current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_read_db)):
     
     """
     Retrieves a contact by given name from the database.
@@ -95,17 +421,18 @@ async def get_contact_by_name(nm: str = Path(),  current_user: User = Depends(au
     :param current_user: curently logged user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contact.
     :rtype: Contact | None
     """
-    contact = db.query(Contact).filter_by(name=nm, user_id = current_user.id).first()
+    result = await db.execute(repository_contacts.contact_lookup(current_user.id, name=nm))
+    contact = result.scalars().first()
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     return contact
 
-@app.get("/contacts/lastname/{l_name}", response_model = ContactResponse, tags = ['contacts'])
-async def get_contact_by_lastname(l_name: str = Path(), current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@app.get("/contacts/lastname/{l_name}", response_model = ContactResponse, tags = ['contacts'], dependencies = [Depends(contacts_read_limit)])
+async def get_contact_by_lastname(l_name: str = Path(), current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_read_db)):
     
     """
     Retrieves a contact by given last name from the database.
@@ -115,18 +442,19 @@ async def get_contact_by_lastname(l_name: str = Path(), current_user: User = Dep
     :param current_user: curently logged user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contact.
     :rtype: Contact | None
     """
-    contact = db.query(Contact).filter_by(lastname=l_name, user_id = current_user.id).first()
+    result = await db.execute(repository_contacts.contact_lookup(current_user.id, lastname=l_name))
+    contact = result.scalars().first()
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     return contact
 
 
-@app.get("/contacts/email/{eml}", response_model = ContactResponse, tags = ['contacts'])
-async def get_contact_by_emal(eml: str = Path(), current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@app.get("/contacts/email/{eml}", response_model = ContactResponse, tags = ['contacts'], dependencies = [Depends(contacts_read_limit)])
+async def get_contact_by_emal(eml: str = Path(), current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_read_db)):
 
     """
     Retrieves a contact by given email from the database.
@@ -136,51 +464,49 @@ async def get_contact_by_emal(eml: str = Path(), current_user: User = Depends(au
     :param current_user: curently logged user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contact.
     :rtype: Contact | None
     """
 
-    contact = db.query(Contact).filter_by(email=eml, user_id = current_user.id).first()
+    result = await db.execute(repository_contacts.contact_lookup(current_user.id, email=eml))
+    contact = result.scalars().first()
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     return contact
 
 
-@app.get("/birthdays", response_model = List[ContactResponse], tags = ['contacts'])
-async def get_birthdays(current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@app.get("/birthdays", response_model = List[ContactResponse], tags = ['contacts'], dependencies = [Depends(contacts_read_limit)])
+async def get_birthdays(request: Request, days: int = Query(7, ge = 1, le = 366),
+                        current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_read_db)):
     
     """
-    Retrieves contacts which birthday is within 7 days.
+    Retrieves contacts which birthday is within given number of days, today included.
 
-    :param eml: contact last name to look for.
-    :type current_user: str
+    Served from the contacts cache like get_contacts; the ETag also changes with the date.
+
+    :param request: request, for its If-None-Match header.
+    :type request: Request
+    :param days: window length in days.
+    :type days: int
     :param current_user: curently logged user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contacts.
-    :rtype: Query
+    :rtype: Response
     """
 
-    today_doy = datetime.today().timetuple().tm_yday 
-    days_per_year, leap_delta = (366, 1) if datetime.now().year%4 == 0 and datetime.now().year%400 == 0 else (365, 0)
-    start_doy = today_doy + leap_delta
-    next_doy = today_doy + 7
+    today = date.today()
 
-    if next_doy > days_per_year :
-        start_doy = leap_delta
-        next_doy -= days_per_year
+    async def build():
+        return contacts_io.to_json(await repository_contacts.get_upcoming_birthdays(current_user.id, days, db, today)), {}
 
-    contacts = db.query(Contact).filter(or_(
-        expression.between(extract('doy', Contact.birthday), start_doy, next_doy-1),
-        expression.between(extract('doy', Contact.birthday), today_doy, today_doy+6),
-        )).all()
-    return contacts
+    return await contacts_cache.respond(request, current_user.id, f"birthdays?days={days}&today={today}", build)
 
 
-@app.post("/contacts", response_model = ContactResponse, tags = ['contacts'])
-async def create_contact(body: ContactModel, current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@app.post("/contacts", response_model = ContactResponse, tags = ['contacts'], dependencies = [Depends(contacts_write_limit)])
+async def create_contact(body: ContactModel, current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_async_db)):
 
     """
     Add contact to database.
@@ -190,21 +516,26 @@ async def create_contact(body: ContactModel, current_user: User = Depends(auth_s
     :param current_user: curently logged user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A list of contacts.
     :rtype: Contact
     """
     contact = Contact (name = body.name, lastname = body.lastname, email = body.email,
-                       phone = body.phone, birthday = body.birthday, additional = body.additional, user = current_user)
+                       phone = body.phone, birthday = body.birthday, additional = body.additional, user_id = current_user.id)
     contact.contact_date = datetime.now()
     db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email or phone already exists")
+    await contacts_cache.bump(current_user.id)
+    await db.refresh(contact)
     return contact
 
 
-@app.delete("/contacts/{cont_id}", status_code=status.HTTP_204_NO_CONTENT, tags = ['contacts'])
-async def remove_contact(cont_id: int = Path(ge = 1), current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@app.delete("/contacts/{cont_id}", status_code=status.HTTP_204_NO_CONTENT, tags = ['contacts'], dependencies = [Depends(contacts_write_limit)])
+async def remove_contact(cont_id: int = Path(ge = 1), current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_async_db)):
     
     """
     Delete contact from database.
@@ -214,24 +545,25 @@ async def remove_contact(cont_id: int = Path(ge = 1), current_user: User = Depen
     :param current_user: curently logged user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contact.
     :rtype: Contact
     """
 
-    contact = db.query(Contact).filter_by(id=cont_id, user_id = current_user.id).first()
+    contact = await repository_contacts.remove_contact(current_user.id, cont_id, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    db.delete(contact)
-    db.commit()
+    await contacts_cache.bump(current_user.id)
     return contact
 
 
-@app.patch("/contacts/{cont_id}/update", response_model = UpdateModel, tags = ['contacts'])
-async def update_contact(body: UpdateModel, cont_id: int = Path(ge = 1), current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+@app.patch("/contacts/{cont_id}/update", response_model = ContactResponse, tags = ['contacts'], dependencies = [Depends(contacts_write_limit)])
+async def update_contact(body: UpdateModel, cont_id: int = Path(ge = 1), current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_async_db)):
     
     """
-    Update user data.
+    Update contact data.
+
+    Only the fields sent in the body are changed, in a single UPDATE ... RETURNING.
 
     :param body: The data for the contact to update.
     :type body: UpdateModel
@@ -240,17 +572,18 @@ async def update_contact(body: UpdateModel, cont_id: int = Path(ge = 1), current
     :param current_user: curently logged user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Contact.
     :rtype: Contact
     """
 
-    contact = db.query(Contact).filter_by(id=cont_id, user_id = current_user.id).first()
+    try:
+        contact = await repository_contacts.update_contact(current_user.id, cont_id,
+                                                           body.model_dump(exclude_unset=True, exclude_none=True), db)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact with this email or phone already exists")
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    contact.email = body.email
-    contact.phone = body.phone
-    contact.additional = body.additional
-    contact.contact_date = datetime.now()
-    db.commit()
+    await contacts_cache.bump(current_user.id)
     return contact
@@ -5,6 +5,7 @@ from sqlalchemy import pool
 
 from alembic import context
 
+from src.conf.config import settings
 from src.db.models import Base
 
 
@@ -17,6 +18,10 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# The database is the one the app uses; the placeholder in alembic.ini is
+# ignored. "%" is escaped because the value goes through ConfigParser.
+config.set_main_option("sqlalchemy.url", settings.sqlalchemy_database_url.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -0,0 +1,66 @@
+"""initial schema
+
+Revision ID: 3f1c2a9d8b10
+Revises: 
+Create Date: 2026-10-18 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d8b10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by the old Base.metadata.create_all() at app startup
+    # already have these tables (as of this revision); the later revisions
+    # bring them up to date. Use "alembic stamp 3f1c2a9d8b10" instead if the
+    # DDL must not inspect the database.
+    existing = set() if context.is_offline_mode() else set(sa.inspect(op.get_bind()).get_table_names())
+    if 'users' not in existing:
+        op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=True),
+        sa.Column('email', sa.String(length=250), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.Column('crated_at', sa.DateTime(), nullable=True),
+        sa.Column('avatar', sa.String(length=255), nullable=True),
+        sa.Column('refresh_token', sa.String(length=255), nullable=True),
+        sa.Column('confirmed', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+        )
+    if 'contacts' not in existing:
+        op.create_table('contacts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('lastname', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('phone', sa.String(), nullable=True),
+        sa.Column('birthday', sa.Date(), nullable=True),
+        sa.Column('additional', sa.String(), nullable=True),
+        sa.Column('contact_date', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_contacts_email'), 'contacts', ['email'], unique=True)
+        op.create_index(op.f('ix_contacts_lastname'), 'contacts', ['lastname'], unique=False)
+        op.create_index(op.f('ix_contacts_name'), 'contacts', ['name'], unique=False)
+        op.create_index(op.f('ix_contacts_phone'), 'contacts', ['phone'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_contacts_phone'), table_name='contacts')
+    op.drop_index(op.f('ix_contacts_name'), table_name='contacts')
+    op.drop_index(op.f('ix_contacts_lastname'), table_name='contacts')
+    op.drop_index(op.f('ix_contacts_email'), table_name='contacts')
+    op.drop_table('contacts')
+    op.drop_table('users')
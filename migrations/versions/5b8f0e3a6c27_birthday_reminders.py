@@ -0,0 +1,36 @@
+"""birthday_reminders table and (birthday_md, user_id) index for the daily digest
+
+Revision ID: 5b8f0e3a6c27
+Revises: e2d5a7c913b4
+Create Date: 2026-10-18 13:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8f0e3a6c27'
+down_revision: Union[str, None] = 'e2d5a7c913b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_contacts_birthday_md_user_id', 'contacts', ['birthday_md', 'user_id'], unique=False)
+    op.create_table('birthday_reminders',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('birthday_reminders')
+    op.drop_index('ix_contacts_birthday_md_user_id', table_name='contacts')
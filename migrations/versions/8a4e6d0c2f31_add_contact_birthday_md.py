@@ -0,0 +1,33 @@
+"""add contacts.birthday_md for indexed birthday lookups
+
+Revision ID: 8a4e6d0c2f31
+Revises: 3f1c2a9d8b10
+Create Date: 2026-10-18 11:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4e6d0c2f31'
+down_revision: Union[str, None] = '3f1c2a9d8b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_md', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE contacts SET birthday_md = "
+        "CAST(EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday) AS INTEGER) "
+        "WHERE birthday IS NOT NULL"
+    )
+    op.create_index('ix_contacts_user_id_birthday_md', 'contacts', ['user_id', 'birthday_md'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_md', table_name='contacts')
+    op.drop_column('contacts', 'birthday_md')
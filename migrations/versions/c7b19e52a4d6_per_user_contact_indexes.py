@@ -0,0 +1,42 @@
+"""per-user contact indexes and email/phone uniqueness
+
+Revision ID: c7b19e52a4d6
+Revises: 8a4e6d0c2f31
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7b19e52a4d6'
+down_revision: Union[str, None] = '8a4e6d0c2f31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_contacts_email', table_name='contacts')
+    op.drop_index('ix_contacts_phone', table_name='contacts')
+    op.drop_index('ix_contacts_name', table_name='contacts')
+    op.drop_index('ix_contacts_lastname', table_name='contacts')
+    op.create_unique_constraint('uq_contacts_user_id_email', 'contacts', ['user_id', 'email'])
+    op.create_unique_constraint('uq_contacts_user_id_phone', 'contacts', ['user_id', 'phone'])
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+    op.create_index('ix_contacts_user_id_name', 'contacts', ['user_id', 'name'], unique=False)
+    op.create_index('ix_contacts_user_id_lastname', 'contacts', ['user_id', 'lastname'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_lastname', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_name', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
+    op.drop_constraint('uq_contacts_user_id_phone', 'contacts', type_='unique')
+    op.drop_constraint('uq_contacts_user_id_email', 'contacts', type_='unique')
+    op.create_index('ix_contacts_lastname', 'contacts', ['lastname'], unique=False)
+    op.create_index('ix_contacts_name', 'contacts', ['name'], unique=False)
+    op.create_index('ix_contacts_phone', 'contacts', ['phone'], unique=True)
+    op.create_index('ix_contacts_email', 'contacts', ['email'], unique=True)
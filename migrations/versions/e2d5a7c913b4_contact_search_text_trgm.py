@@ -0,0 +1,33 @@
+"""contacts.search_text with a trigram GIN index for search
+
+Revision ID: e2d5a7c913b4
+Revises: c7b19e52a4d6
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2d5a7c913b4'
+down_revision: Union[str, None] = 'c7b19e52a4d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    op.add_column('contacts', sa.Column('search_text', sa.String(), sa.Computed(
+        "lower(coalesce(name, '') || ' ' || coalesce(lastname, '') || ' ' || "
+        "coalesce(email, '') || ' ' || coalesce(phone, ''))", persisted=True), nullable=True))
+    op.create_index('ix_contacts_user_id_search_text_trgm', 'contacts', ['user_id', 'search_text'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_search_text_trgm', table_name='contacts')
+    op.drop_column('contacts', 'search_text')
@@ -1,23 +1,74 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, Boolean, func
-from src.db.db import Base, engine
+from datetime import date
+
+from sqlalchemy import Column, Integer, String, DateTime, Date, Boolean, Index, UniqueConstraint, Computed, DDL, event, func
+from src.db.db import Base
 from sqlalchemy.sql.sqltypes import DateTime
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql.schema import ForeignKey
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.sql.schema import ForeignKey, PrimaryKeyConstraint
+
+def month_day(value: date) -> int:
+
+    """
+    Encodes the month and day of a date as MMDD, e.g. 2024-03-11 -> 311.
+
+    :param value: date to encode.
+    :type value: date
+    :return: month * 100 + day.
+    :rtype: int
+    """
+
+    return value.month * 100 + value.day
+
 
 class Contact(Base):
     __tablename__ = "contacts"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'email', name='uq_contacts_user_id_email'),
+        UniqueConstraint('user_id', 'phone', name='uq_contacts_user_id_phone'),
+        Index('ix_contacts_user_id_id', 'user_id', 'id'),
+        Index('ix_contacts_user_id_name', 'user_id', 'name'),
+        Index('ix_contacts_user_id_lastname', 'user_id', 'lastname'),
+        Index('ix_contacts_user_id_birthday_md', 'user_id', 'birthday_md'),
+        Index('ix_contacts_birthday_md_user_id', 'birthday_md', 'user_id'),
+        Index('ix_contacts_user_id_search_text_trgm', 'user_id', 'search_text', postgresql_using='gin',
+              postgresql_ops={'search_text': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
 
     id = Column(Integer, primary_key=True)
-    name = Column(String, index=True)
-    lastname = Column(String, index=True)
-    email = Column(String, unique=True, index=True)
-    phone = Column(String, unique=True, index=True)
+    name = Column(String)
+    lastname = Column(String)
+    email = Column(String)
+    phone = Column(String)
     birthday = Column(Date)
+    birthday_md = Column(Integer)
     additional = Column(String)
     contact_date = Column(DateTime)
+    search_text = Column(String, Computed("lower(coalesce(name, '') || ' ' || coalesce(lastname, '') || ' ' || "
+                                          "coalesce(email, '') || ' ' || coalesce(phone, ''))", persisted=True))
     user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
     user = relationship('User', backref="contacts")
 
+    @validates('birthday')
+    def _set_birthday_md(self, key, value):
+        self.birthday_md = month_day(value) if value is not None else None
+        return value
+
+# SQLite stand-in for the Postgres trigram index: an external-content FTS5
+# table over contacts.search_text, kept in sync by triggers.
+for statement in (
+    "CREATE VIRTUAL TABLE contacts_fts USING fts5(search_text, content='contacts', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+    "INSERT INTO contacts_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+    "CREATE TRIGGER contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+    "CREATE TRIGGER contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+    "INSERT INTO contacts_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+):
+    event.listen(Contact.__table__, "after_create", DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Contact.__table__, "before_drop", DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect='sqlite'))
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
@@ -29,4 +80,14 @@ class User(Base):
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+class BirthdayReminder(Base):
+    __tablename__ = "birthday_reminders"
+    __table_args__ = (
+        PrimaryKeyConstraint('user_id', 'day'),
+    )
+
+    user_id = Column(ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    day = Column(Date, nullable=False)
+    status = Column(String(16), nullable=False)
+    claimed_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
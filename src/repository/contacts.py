@@ -0,0 +1,419 @@
+import calendar
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, update, delete, values, case, or_, func, literal, table, column, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.db import AsyncSessionLocal, dialect_insert
+from src.db.models import Contact, month_day
+from src.schemas import ContactModel, ImportReport, ImportRowError
+from src.services.contacts_io import ParsedRow
+
+STREAM_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+
+def contact_lookup(user_id: int, **criteria):
+
+    """
+    Builds the query for a single user contact matching all given columns.
+
+    Every lookup is scoped by ``user_id`` first, so it is served by one of
+    the per-user composite indexes.
+
+    :param user_id: owner of the contact.
+    :type user_id: int
+    :param criteria: column values to match, e.g. ``name="Ivan"``.
+    :return: The select statement.
+    :rtype: Select
+    """
+
+    return select(Contact).filter_by(user_id=user_id, **criteria).limit(1)
+
+
+def _contacts_after(user_id: int, after_id: int):
+    return select(Contact).filter(Contact.user_id == user_id, Contact.id > after_id).order_by(Contact.id)
+
+
+async def get_contacts_page(user_id: int, limit: int, after_id: int, db: AsyncSession) -> List[Contact]:
+
+    """
+    Retrieves one keyset page of user contacts ordered by id.
+
+    :param user_id: owner of the contacts.
+    :type user_id: int
+    :param limit: page size.
+    :type limit: int
+    :param after_id: last contact id of the previous page, 0 for the first page.
+    :type after_id: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Contacts.
+    :rtype: List[Contact]
+    """
+
+    result = await db.execute(_contacts_after(user_id, after_id).limit(limit))
+    return result.scalars().all()
+
+
+async def stream_contact_batches(user_id: int, after_id: int = 0) -> AsyncIterator[List[Contact]]:
+
+    """
+    Streams user contacts ordered by id through a server-side cursor.
+
+    The generator owns its session, so it stays open for as long as the
+    response is being sent, and rows are fetched in batches of
+    ``STREAM_BATCH_SIZE`` so memory doesn't grow with the number of contacts.
+
+    :param user_id: owner of the contacts.
+    :type user_id: int
+    :param after_id: only contacts with a greater id are streamed.
+    :type after_id: int
+    :return: batches of contacts.
+    :rtype: AsyncIterator[List[Contact]]
+    """
+
+    async with AsyncSessionLocal() as db:
+        stmt = _contacts_after(user_id, after_id).execution_options(yield_per=STREAM_BATCH_SIZE)
+        result = await db.stream_scalars(stmt)
+        async for batch in result.partitions():
+            yield batch
+
+
+def birthday_window(today: date, days: int) -> Tuple[int, int]:
+
+    """
+    Returns the MMDD bounds of a window of ``days`` days starting today.
+
+    The window wraps around the new year when end < start. In a non-leap
+    year a window ending on February 28 also covers February 29, so those
+    birthdays aren't skipped.
+
+    :param today: first day of the window.
+    :type today: date
+    :param days: window length in days, today included.
+    :type days: int
+    :return: start and end MMDD, both inclusive.
+    :rtype: Tuple[int, int]
+    """
+
+    end = today + timedelta(days=days - 1)
+    start_md, end_md = month_day(today), month_day(end)
+    if end.month == 2 and end.day == 28 and not calendar.isleap(end.year):
+        end_md = 229
+    if end.year > today.year and end_md >= start_md:
+        return 101, 1231
+    return start_md, end_md
+
+
+async def get_upcoming_birthdays(user_id: int, days: int, db: AsyncSession, today: date | None = None) -> List[Contact]:
+
+    """
+    Retrieves user contacts with a birthday within the next ``days`` days.
+
+    Filters on the indexed ``(user_id, birthday_md)`` pair, so the lookup is
+    one or two index range scans. Results are ordered by upcoming date.
+
+    :param user_id: owner of the contacts.
+    :type user_id: int
+    :param days: window length in days, today included.
+    :type days: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :param today: first day of the window, defaults to the current date.
+    :type today: date | None
+    :return: Contacts.
+    :rtype: List[Contact]
+    """
+
+    start_md, end_md = birthday_window(today or date.today(), days)
+    stmt = select(Contact).filter(Contact.user_id == user_id)
+    if start_md <= end_md:
+        stmt = stmt.filter(Contact.birthday_md.between(start_md, end_md)).order_by(Contact.birthday_md)
+    else:
+        stmt = stmt.filter(or_(Contact.birthday_md >= start_md, Contact.birthday_md <= end_md))\
+                   .order_by(case((Contact.birthday_md >= start_md, 0), else_=1), Contact.birthday_md)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+def contact_values(fields: dict) -> dict:
+
+    """
+    Column values for a contact write, with ``birthday_md`` kept in step with ``birthday``.
+
+    Bulk UPDATE statements bypass the ORM validator that normally sets it.
+
+    :param fields: column values to write.
+    :type fields: dict
+    :return: values including ``birthday_md`` when ``birthday`` is given.
+    :rtype: dict
+    """
+
+    if fields.get("birthday") is not None:
+        fields = {**fields, "birthday_md": month_day(fields["birthday"])}
+    return fields
+
+
+async def update_contact(user_id: int, contact_id: int, fields: dict, db: AsyncSession) -> Contact | None:
+
+    """
+    Updates the given columns of a user contact with one ``UPDATE ... RETURNING``.
+
+    :param user_id: owner of the contact.
+    :type user_id: int
+    :param contact_id: contact to update.
+    :type contact_id: int
+    :param fields: column values to set, columns left out keep their value.
+    :type fields: dict
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The updated contact, or None if the user has no such contact.
+    :rtype: Contact | None
+    :raises IntegrityError: if the new email or phone belongs to another contact of the user.
+    """
+
+    stmt = update(Contact).where(Contact.id == contact_id, Contact.user_id == user_id)\
+                          .values(**contact_values(fields), contact_date=datetime.now())\
+                          .returning(Contact)
+    contact = await db.scalar(stmt)
+    await db.commit()
+    return contact
+
+
+async def remove_contact(user_id: int, contact_id: int, db: AsyncSession) -> Contact | None:
+
+    """
+    Deletes a user contact with one ``DELETE ... RETURNING``.
+
+    :param user_id: owner of the contact.
+    :type user_id: int
+    :param contact_id: contact to delete.
+    :type contact_id: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The deleted contact, or None if the user has no such contact.
+    :rtype: Contact | None
+    """
+
+    contact = await db.scalar(delete(Contact).where(Contact.id == contact_id, Contact.user_id == user_id)
+                              .returning(Contact))
+    await db.commit()
+    return contact
+
+
+async def get_contacts_by_ids(user_id: int, ids: List[int], db: AsyncSession) -> List[Contact]:
+
+    """
+    Retrieves the user contacts with the given ids in one query.
+
+    :param user_id: owner of the contacts.
+    :type user_id: int
+    :param ids: contact ids.
+    :type ids: List[int]
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Contacts found, in no particular order.
+    :rtype: List[Contact]
+    """
+
+    result = await db.execute(select(Contact).filter(Contact.user_id == user_id, Contact.id.in_(ids)))
+    return result.scalars().all()
+
+
+async def update_contacts(user_id: int, items: List[dict], db: AsyncSession) -> List[Contact]:
+
+    """
+    Applies a partial update to each of several user contacts in one statement.
+
+    The items are sent as a ``VALUES`` list joined to contacts by id, and
+    every column takes the item's value or keeps its own when the item has
+    none (``coalesce``). Only columns set by at least one item are listed,
+    so each has a typed value for Postgres to infer the column type from.
+
+    :param user_id: owner of the contacts.
+    :type user_id: int
+    :param items: column values to set, each with the contact ``id``.
+    :type items: List[dict]
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Updated contacts, in no particular order.
+    :rtype: List[Contact]
+    :raises IntegrityError: if an email or phone would belong to two contacts of the user; nothing is updated then.
+    """
+
+    items = [contact_values(item) for item in items]
+    names = ["id"] + sorted({name for item in items for name in item} - {"id"})
+    columns = Contact.__table__.c
+    patch = values(*(column(name, columns[name].type) for name in names), name="patch")\
+        .data([tuple(item.get(name) for name in names) for item in items]).cte("patch")
+    stmt = update(Contact).where(Contact.id == patch.c.id, Contact.user_id == user_id)\
+                          .values({**{name: func.coalesce(patch.c[name], columns[name]) for name in names[1:]},
+                                   "contact_date": datetime.now()})\
+                          .returning(Contact)
+    result = await db.execute(stmt)
+    contacts = result.scalars().all()
+    await db.commit()
+    return contacts
+
+
+async def remove_contacts(user_id: int, ids: List[int], db: AsyncSession) -> List[int]:
+
+    """
+    Deletes the user contacts with the given ids in one statement.
+
+    :param user_id: owner of the contacts.
+    :type user_id: int
+    :param ids: contact ids.
+    :type ids: List[int]
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Ids of the deleted contacts.
+    :rtype: List[int]
+    """
+
+    result = await db.execute(delete(Contact).where(Contact.user_id == user_id, Contact.id.in_(ids))
+                              .returning(Contact.id))
+    deleted = result.scalars().all()
+    await db.commit()
+    return deleted
+
+
+def _add_error(report: ImportReport, row: int, errors: List[str]) -> None:
+    if len(report.errors) < IMPORT_MAX_ERRORS:
+        report.errors.append(ImportRowError(row=row, errors=errors))
+    else:
+        report.errors_truncated = True
+
+
+async def _insert_batch(batch: List[Tuple[int, dict]], report: ImportReport, db: AsyncSession) -> None:
+    stmt = dialect_insert(db, Contact).values([row_values for _, row_values in batch])\
+                      .on_conflict_do_nothing()\
+                      .returning(Contact.email, Contact.phone)
+    result = await db.execute(stmt)
+    inserted = Counter(tuple(row) for row in result.all())
+    await db.commit()
+    for row, row_values in batch:
+        key = (row_values["email"], row_values["phone"])
+        if inserted[key] > 0:
+            inserted[key] -= 1
+            report.inserted += 1
+        else:
+            report.duplicates += 1
+            _add_error(report, row, ["contact with this email or phone already exists"])
+
+
+async def import_contacts(user_id: int, rows: AsyncIterator[ParsedRow], db: AsyncSession) -> ImportReport:
+
+    """
+    Validates parsed rows with ContactModel and inserts them in batches.
+
+    Each batch of ``IMPORT_BATCH_SIZE`` valid rows is one multi-row
+    ``INSERT ... ON CONFLICT DO NOTHING`` and is committed on its own, so
+    only one batch is held in memory. Rows clashing with the per-user
+    email/phone constraints are reported as duplicates. At most
+    ``IMPORT_MAX_ERRORS`` row errors are listed.
+
+    :param user_id: owner of the contacts.
+    :type user_id: int
+    :param rows: parsed rows from contacts_io.
+    :type rows: AsyncIterator[ParsedRow]
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Counts and per-row errors.
+    :rtype: ImportReport
+    """
+
+    report = ImportReport()
+    batch = []
+    contact_date = datetime.now()
+    async for row, data, error in rows:
+        if error is not None:
+            report.failed += 1
+            _add_error(report, row, [error])
+            continue
+        try:
+            body = ContactModel(**data)
+        except ValidationError as e:
+            report.failed += 1
+            _add_error(report, row, [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()])
+            continue
+        batch.append((row, dict(body.model_dump(), birthday_md=month_day(body.birthday),
+                                contact_date=contact_date, user_id=user_id)))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await _insert_batch(batch, report, db)
+            batch = []
+    if batch:
+        await _insert_batch(batch, report, db)
+    report.errors.sort(key=lambda error: error.row)
+    return report
+
+
+contacts_fts = table("contacts_fts", column("rowid"), column("rank"))
+
+
+def _trigrams(q: str) -> List[str]:
+    return list(dict.fromkeys(q[n:n + 3] for n in range(len(q) - 2)))
+
+
+def search_query(user_id: int, q: str, dialect: str):
+
+    """
+    Builds a ranked, typo-tolerant search over name, lastname, email and phone.
+
+    On Postgres it matches ``search_text`` by trigram word similarity or
+    substring, both served by the GIN ``(user_id, search_text gin_trgm_ops)``
+    index. On the SQLite stand-in it ORs the query trigrams against the FTS5
+    trigram table and ranks by bm25. Queries shorter than three characters
+    fall back to a substring match within the user's contacts.
+
+    :param user_id: owner of the contacts.
+    :type user_id: int
+    :param q: search text.
+    :type q: str
+    :param dialect: database dialect name.
+    :type dialect: str
+    :return: The select statement, best matches first.
+    :rtype: Select
+    """
+
+    q = q.strip().lower()
+    stmt = select(Contact).filter(Contact.user_id == user_id)
+    if dialect == "sqlite":
+        trigrams = _trigrams(q)
+        if not trigrams:
+            return stmt.filter(Contact.search_text.contains(q, autoescape=True)).order_by(Contact.id)
+        match = " OR ".join('"{}"'.format(trigram.replace('"', '""')) for trigram in trigrams)
+        return stmt.join(contacts_fts, contacts_fts.c.rowid == Contact.id)\
+                   .filter(text("contacts_fts MATCH :match").bindparams(match=match))\
+                   .order_by(contacts_fts.c.rank, Contact.id)
+    score = func.word_similarity(q, Contact.search_text)
+    return stmt.filter(or_(literal(q).op("<%")(Contact.search_text), Contact.search_text.contains(q, autoescape=True)))\
+               .order_by(score.desc(), Contact.id)
+
+
+async def search_contacts(user_id: int, q: str, limit: int, offset: int, db: AsyncSession) -> List[Contact]:
+
+    """
+    Retrieves one page of ranked search results.
+
+    :param user_id: owner of the contacts.
+    :type user_id: int
+    :param q: search text.
+    :type q: str
+    :param limit: page size.
+    :type limit: int
+    :param offset: number of results to skip.
+    :type offset: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Contacts.
+    :rtype: List[Contact]
+    """
+
+    result = await db.execute(search_query(user_id, q, db.bind.dialect.name).limit(limit).offset(offset))
+    return result.scalars().all()
@@ -0,0 +1,144 @@
+import calendar
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, List, NamedTuple
+
+from sqlalchemy import select, update, or_, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.db import AsyncSessionLocal, dialect_insert
+from src.db.models import BirthdayReminder, Contact, User, month_day
+
+STREAM_BATCH_SIZE = 1000
+
+
+class Digest(NamedTuple):
+    user_id: int
+    email: str
+    username: str
+    contacts: List[dict]
+
+
+def birthday_days(day: date) -> List[int]:
+
+    """
+    MMDD values celebrated on the given day.
+
+    February 29 birthdays are celebrated on February 28 in non-leap years.
+
+    :param day: the day.
+    :type day: date
+    :return: MMDD values.
+    :rtype: List[int]
+    """
+
+    days = [month_day(day)]
+    if day.month == 2 and day.day == 28 and not calendar.isleap(day.year):
+        days.append(229)
+    return days
+
+
+async def iter_digests(day: date, shard: int = 0, shards: int = 1) -> AsyncIterator[Digest]:
+
+    """
+    Streams one digest per confirmed user with contacts celebrating on ``day``.
+
+    All users are covered in a single pass over the ``(birthday_md, user_id)``
+    index, read through a server-side cursor ordered by user. With
+    ``shards > 1`` only users with ``user_id % shards == shard`` are included.
+
+    :param day: the day.
+    :type day: date
+    :param shard: shard number, 0 based.
+    :type shard: int
+    :param shards: total number of shards.
+    :type shards: int
+    :return: digests.
+    :rtype: AsyncIterator[Digest]
+    """
+
+    stmt = select(Contact.user_id, User.email, User.username, Contact.name, Contact.lastname, Contact.email, Contact.phone)\
+        .join(User, Contact.user_id == User.id)\
+        .filter(Contact.birthday_md.in_(birthday_days(day)), User.confirmed == True)
+    if shards > 1:
+        stmt = stmt.filter(Contact.user_id % shards == shard)
+    stmt = stmt.order_by(Contact.user_id, Contact.id).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt)
+        digest = None
+        async for user_id, user_email, username, name, lastname, email, phone in result:
+            if digest is None or digest.user_id != user_id:
+                if digest is not None:
+                    yield digest
+                digest = Digest(user_id, user_email, username, [])
+            digest.contacts.append({"name": name, "lastname": lastname, "email": email, "phone": phone})
+        if digest is not None:
+            yield digest
+
+
+async def claim(user_id: int, day: date, stale_after: int, db: AsyncSession) -> bool:
+
+    """
+    Claims the user's digest for the day so it is sent only once.
+
+    A claim succeeds if there is no record yet, if the previous attempt
+    failed, or if a pending claim is older than ``stale_after`` seconds
+    (its worker is assumed to have crashed).
+
+    :param user_id: the user.
+    :type user_id: int
+    :param day: the day.
+    :type day: date
+    :param stale_after: seconds after which a pending claim can be taken over.
+    :type stale_after: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: whether this worker should send the digest.
+    :rtype: bool
+    """
+
+    now = datetime.now()
+    stmt = dialect_insert(db, BirthdayReminder).values(user_id=user_id, day=day, status="pending", claimed_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BirthdayReminder.user_id, BirthdayReminder.day],
+        set_={"status": "pending", "claimed_at": now},
+        where=or_(BirthdayReminder.status == "failed",
+                  and_(BirthdayReminder.status == "pending",
+                       BirthdayReminder.claimed_at < now - timedelta(seconds=stale_after))),
+    ).returning(BirthdayReminder.user_id)
+    result = await db.execute(stmt)
+    claimed = result.first() is not None
+    await db.commit()
+    return claimed
+
+
+async def count_unsent(day: date, shard: int, shards: int, db: AsyncSession) -> int:
+
+    """
+    Counts the day's digests that were claimed but not sent: failed ones and
+    pending ones, whether still being sent or left behind by a crash.
+
+    :param day: the day.
+    :type day: date
+    :param shard: shard number, 0 based.
+    :type shard: int
+    :param shards: total number of shards.
+    :type shards: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: number of unsent digests.
+    :rtype: int
+    """
+
+    stmt = select(func.count()).select_from(BirthdayReminder)\
+        .filter(BirthdayReminder.day == day, BirthdayReminder.status.in_(("failed", "pending")))
+    if shards > 1:
+        stmt = stmt.filter(BirthdayReminder.user_id % shards == shard)
+    return await db.scalar(stmt)
+
+
+async def set_status(user_id: int, day: date, status: str, db: AsyncSession) -> None:
+    stmt = update(BirthdayReminder).filter_by(user_id=user_id, day=day)\
+        .values(status=status, sent_at=datetime.now() if status == "sent" else None)
+    await db.execute(stmt)
+    await db.commit()
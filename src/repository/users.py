@@ -1,41 +1,77 @@
-from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+import hashlib
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.db import dialect_insert
 from src.db.models import User
 from src.schemas import UserModel
+from src.services.cache import user_cache
+
+
+async def get_user_by_email(email: str, db: AsyncSession) -> User:
+    result = await db.execute(select(User).filter(User.email == email))
+    return result.scalar_one_or_none()
+
+
+def gravatar_url(email: str) -> str:
+
+    """
+    Gravatar image URL of an email, the same one libgravatar builds.
 
+    :param email: email address.
+    :type email: str
+    :return: image URL.
+    :rtype: str
+    """
 
-async def get_user_by_email(email: str, db: Session) -> User:
-    return db.query(User).filter(User.email == email).first()
+    return f"https://www.gravatar.com/avatar/{hashlib.md5(email.strip().lower().encode()).hexdigest()}"
 
 
-async def create_user(body: UserModel, db: Session) -> User:
-    avatar = None
-    try:
-        g = Gravatar(body.email)
-        avatar = g.get_image()
-    except Exception as e:
-        print(e)
-    new_user = User(**body.dict(), avatar=avatar)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+async def create_user(body: UserModel, db: AsyncSession) -> User | None:
+
+    """
+    Inserts a user in one statement.
+
+    :param body: signup data with the password already hashed.
+    :type body: UserModel
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: the new user, or None if the email is taken.
+    :rtype: User | None
+    """
+
+    stmt = (
+        dialect_insert(db, User)
+        .values(**body.dict(), avatar=gravatar_url(body.email))
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
+    )
+    new_user = await db.scalar(stmt)
+    await db.commit()
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_token(user: User, token: str | None, db: AsyncSession) -> None:
     user.refresh_token = token
-    db.commit()
+    await db.commit()
+
+
+async def update_password(user: User, hashed_password: str, db: AsyncSession) -> None:
+    user.password = hashed_password
+    await db.commit()
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     user = await get_user_by_email(email, db)
     user.confirmed = True
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(email)
 
 
-async def update_avatar(email, url: str, db: Session) -> User:
+async def update_avatar(email, url: str, db: AsyncSession) -> User:
     user = await get_user_by_email(email, db)
     user.avatar = url
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(email)
     return user
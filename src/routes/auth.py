@@ -1,51 +1,50 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db.db import get_db
+from src.db.db import get_async_db
 from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 from src.repository import users as repository_users
 from src.services.auth import auth_service
-from src.services.email import send_email
+from src.services.rate_limit import RateLimit
+from src.services.queue import job_queue
 
 import datetime
 from datetime import timedelta
-import jwt
-from jose.exceptions import JWTError
+from jose import JWTError, jwt
 
 router = APIRouter(prefix='/auth', tags=["auth"])
 security = HTTPBearer()
 
 
-@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(RateLimit("signup"))])
+async def signup(body: UserModel, request: Request, db: AsyncSession = Depends(get_async_db)):
     
     """
     User signup.
 
     :param body: The data for the user to signup.
     :type body: UserModel
-    :param background_tasks: BackgroundTasks.
-    :type background_tasks:  BackgroundTasks
+    :param request: request.
+    :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: new user with comments.
     :rtype: Dict | None
     """
 
-    exist_user = await repository_users.get_user_by_email(body.email, db)
-    if exist_user:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
+    if new_user is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
+    await job_queue.enqueue("send_email", new_user.email, new_user.username, str(request.base_url))
     return {"user": new_user, "detail": "User successfully created. Check your email for confirmation."}
 
 
-@router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@router.post("/login", response_model=TokenModel, dependencies=[Depends(RateLimit("login"))])
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
 
     """
     User login.
@@ -53,7 +52,7 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
     :param body: The data for the user to login.
     :type body:  OAuth2PasswordRequestForm
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: tokens.
     :rtype: Dict | None
     """
@@ -63,8 +62,11 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_password(body.password, user.password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
+    if new_hash:
+        await repository_users.update_password(user, new_hash, db)
     # Generate JWT
     access_token = await auth_service.create_access_token(data={"sub": user.email})
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
@@ -73,8 +75,8 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
 
 
 
-@router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+@router.get('/confirmed_email/{token}', dependencies=[Depends(RateLimit("confirmed_email"))])
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_async_db)):
 
     """
     Email confirmation.
@@ -82,7 +84,7 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
     :param token: token.
     :type token: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: message.
     :rtype: Dict | None
     """
@@ -97,21 +99,18 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
     return {"message": "Email confirmed"}
 
 
-@router.post('/request_email')
-async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+@router.post('/request_email', dependencies=[Depends(RateLimit("request_email"))])
+async def request_email(body: RequestEmail, request: Request, db: AsyncSession = Depends(get_async_db)):
     
     """
     Email request.
 
     :param body: The data for email request.
     :type body: RequestEmail
-    :param background_tasks: BackgroundTasks.
-    :type background_tasks:  BackgroundTasks
     :param request: request.
     :type request: Request    
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Message.
     :rtype: Dict
     """
@@ -121,12 +120,12 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(send_email, user.email, user.username, request.base_url)
+        await job_queue.enqueue("send_email", user.email, user.username, str(request.base_url))
     return {"message": "Check your email for confirmation."}
 
 
-@router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+@router.get('/refresh_token', response_model=TokenModel, dependencies=[Depends(RateLimit("refresh_token"))])
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: AsyncSession = Depends(get_async_db)):
 
     """
     Token refresh.
@@ -134,7 +133,7 @@ async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(sec
     :param credentials: token.
     :type credentials: HTTPAuthorizationCredentials
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: message.
     :rtype: Dict | None
     """
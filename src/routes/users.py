@@ -1,26 +1,25 @@
 from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db.db import get_db
+from src.db.db import get_async_db
 from src.db.models import User
 from src.repository import users as repository_users
 from src.services.auth import auth_service
-from src.conf.config import settings
+from src.services.rate_limit import UserRateLimit
+from src.services.avatars import avatar_pipeline
 from src.schemas import UserDb
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-@router.get("/me/", response_model=UserDb)
+@router.get("/me/", response_model=UserDb, dependencies=[Depends(UserRateLimit("users_me"))])
 async def read_users_me(current_user: User = Depends(auth_service.get_current_user)):
     return current_user
 
 
-@router.patch('/avatar', response_model=UserDb)
+@router.patch('/avatar', response_model=UserDb, dependencies=[Depends(UserRateLimit("avatar"))])
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+                             db: AsyncSession = Depends(get_async_db)):
     
     """
     Avatar changing.
@@ -28,22 +27,13 @@ async def update_avatar_user(file: UploadFile = File(), current_user: User = Dep
     :param file: avtar pic.
     :type file: UploadFile   
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: curently logged user.
     :type current_user: User
     :return: user.
     :rtype: User
     """
 
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'contacts/{current_user.username}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'contacts/{current_user.username}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
+    src_url = await avatar_pipeline.upload(file, str(current_user.id))
     user = await repository_users.update_avatar(current_user.email, src_url, db)
     return user
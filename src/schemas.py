@@ -1,5 +1,9 @@
-from pydantic import BaseModel, Field, EmailStr, HttpUrl
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, EmailStr, HttpUrl, field_validator
 from datetime import datetime, date
+
+from src.conf.config import settings
         
 class ContactModel(BaseModel):
     name: str = Field(min_length=3, max_length=16)
@@ -23,10 +27,65 @@ class ContactResponse(BaseModel):
         orm_mode = True
 
 class UpdateModel(BaseModel):
-    email: EmailStr
-    phone: str = Field(min_length=5, max_length=16)
-    additional: str = Field(max_length=100)
-        
+    name: Optional[str] = Field(None, min_length=3, max_length=16)
+    lastname: Optional[str] = Field(None, min_length=3, max_length=16)
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = Field(None, min_length=5, max_length=16)
+    birthday: Optional[date] = None
+    additional: Optional[str] = Field(None, max_length=100)
+
+
+def unique_ids(ids: List[int]) -> List[int]:
+    if len(set(ids)) != len(ids):
+        raise ValueError("ids must be unique")
+    return ids
+
+
+class BatchIds(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=settings.contacts_batch_size)
+
+    @field_validator("ids")
+    @classmethod
+    def _unique(cls, ids: List[int]) -> List[int]:
+        return unique_ids(ids)
+
+
+class BatchUpdateItem(UpdateModel):
+    id: int = Field(ge=1)
+
+
+class BatchUpdate(BaseModel):
+    items: List[BatchUpdateItem] = Field(min_length=1, max_length=settings.contacts_batch_size)
+
+    @field_validator("items")
+    @classmethod
+    def _unique(cls, items: List[BatchUpdateItem]) -> List[BatchUpdateItem]:
+        unique_ids([item.id for item in items])
+        return items
+
+
+class BatchItemResult(BaseModel):
+    id: int
+    status: int
+    contact: Optional[ContactResponse] = None
+
+
+class BatchResult(BaseModel):
+    results: List[BatchItemResult]
+
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class ImportReport(BaseModel):
+    inserted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
+
 
 class UserModel(BaseModel):
     username: str = Field(min_length=5, max_length=16)
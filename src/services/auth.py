@@ -3,28 +3,50 @@ from typing import Optional
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db.db import get_db
+from src.db.db import get_async_db
 from src.repository import users as repository_users
-import pickle, redis
+from src.services.cache import CachedUser, ClaimsCache, user_cache
+from src.services.passwords import password_pool
 
 from src.conf.config import settings
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    password_pool = password_pool
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    user_cache = user_cache
+    claims_cache = ClaimsCache(settings.jwt_cache_size)
 
-    def verify_password(self, plain_password, hashed_password):
-        return self.pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password, hashed_password) -> tuple[bool, str | None]:
+        return await self.password_pool.verify_and_update(plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
-        return self.pwd_context.hash(password)
+    async def get_password_hash(self, password: str):
+        return await self.password_pool.hash(password)
+
+    def decode_token(self, token: str) -> dict:
+
+        """
+        Verifies the token and returns its claims.
+
+        Verified claims are cached until the token expires, so a token
+        reused across requests is only checked once.
+
+        :param token: JWT.
+        :type token: str
+        :return: claims.
+        :rtype: dict
+        :raises JWTError: if the token is invalid or expired.
+        """
+
+        claims = self.claims_cache.get(token)
+        if claims is None:
+            claims = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            self.claims_cache.set(token, claims)
+        return claims
 
     def create_email_token(self, data: dict):
         to_encode = data.copy()
@@ -58,7 +80,7 @@ class Auth:
 
     async def decode_refresh_token(self, refresh_token: str):
         try:
-            payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(refresh_token)
             if payload['scope'] == 'refresh_token':
                 email = payload['sub']
                 return email
@@ -66,7 +88,7 @@ class Auth:
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> CachedUser:
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -75,7 +97,7 @@ class Auth:
 
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             if payload['scope'] == 'access_token':
                 email = payload["sub"]
                 if email is None:
@@ -84,21 +106,18 @@ class Auth:
                 raise credentials_exception
         except JWTError as e:
             raise credentials_exception
-        user = self.r.get(f"user:{email}")
+        user = await self.user_cache.get(email)
         if user is None:
             user = await repository_users.get_user_by_email(email, db)
             if user is None:
                 raise credentials_exception
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
-        else:
-            user = pickle.loads(user)
+            user = await self.user_cache.set(user)
         return user
 
 
     async def get_email_from_token(self, token: str):
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             email = payload["sub"]
             return email
         except JWTError as e:
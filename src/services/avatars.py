@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Protocol
+
+from fastapi import HTTPException, UploadFile, status
+
+from src.conf.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def resize(path: str, size: int) -> bytes:
+
+    """
+    Crops an image to a centered square and re-encodes it as JPEG.
+
+    Runs in a worker process, so it takes a file path rather than the image bytes.
+
+    :param path: image file.
+    :type path: str
+    :param size: side of the result in pixels.
+    :type size: int
+    :return: JPEG data.
+    :rtype: bytes
+    """
+
+    from PIL import Image, ImageOps  # imported on first use, it only runs in upload workers
+
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        image = ImageOps.fit(image.convert("RGB"), (size, size), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=85, optimize=True)
+    return out.getvalue()
+
+
+class AvatarStorage(Protocol):
+
+    async def save(self, key: str, data: bytes) -> str:
+
+        """
+        Stores a resized avatar.
+
+        :param key: unique name of the avatar.
+        :type key: str
+        :param data: JPEG data.
+        :type data: bytes
+        :return: public URL of the avatar.
+        :rtype: str
+        """
+
+
+class LocalStorage:
+
+    """
+    Keeps avatars as files in ``root``, served under ``base_url``.
+    """
+
+    def __init__(self, root: str | Path, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def _write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    async def save(self, key: str, data: bytes) -> str:
+        name = f"{key}.jpg"
+        await asyncio.to_thread(self._write, self.root / name, data)
+        return f"{self.base_url}/{name}?v={hashlib.md5(data).hexdigest()[:12]}"
+
+
+class CloudinaryStorage:
+
+    """
+    Uploads avatars to Cloudinary from a worker thread.
+    """
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str, folder: str = "contacts"):
+        self.options = dict(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+        self.folder = folder
+
+    def _upload(self, key: str, data: bytes) -> str:
+        import cloudinary
+        import cloudinary.uploader
+
+        cloudinary.config(**self.options)
+        r = cloudinary.uploader.upload(data, public_id=f"{self.folder}/{key}", overwrite=True)
+        return r["secure_url"]
+
+    async def save(self, key: str, data: bytes) -> str:
+        return await asyncio.to_thread(self._upload, key, data)
+
+
+class AvatarPipeline:
+
+    """
+    Spools an upload to disk, resizes it in a process pool and stores the result.
+
+    The upload is copied in ``CHUNK_SIZE`` pieces, so memory use doesn't grow
+    with the file size, and rejected with 413 once it exceeds ``max_bytes``.
+    Only the small resized image is passed back from the worker process.
+    """
+
+    def __init__(self, storage: AvatarStorage, size: int = 250, max_bytes: int = 10 * 1024 * 1024, workers: int = 2):
+        self.storage = storage
+        self.size = size
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _spool(self, file: UploadFile) -> str:
+        fd, path = tempfile.mkstemp(suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                total = 0
+                while chunk := await file.read(CHUNK_SIZE):
+                    total += len(chunk)
+                    if total > self.max_bytes:
+                        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                            detail=f"Avatar must be at most {self.max_bytes} bytes")
+                    await asyncio.to_thread(out.write, chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path
+
+    async def upload(self, file: UploadFile, key: str) -> str:
+
+        """
+        Stores an uploaded image as a square avatar.
+
+        :param file: uploaded image.
+        :type file: UploadFile
+        :param key: unique name of the avatar.
+        :type key: str
+        :return: public URL of the avatar.
+        :rtype: str
+        :raises HTTPException: 413 if the file is too large, 400 if it is not an image.
+        """
+
+        from PIL import Image, UnidentifiedImageError
+
+        path = await self._spool(file)
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(self.executor, resize, path, self.size)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            print(e)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported image")
+        finally:
+            os.unlink(path)
+        return await self.storage.save(key, data)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def get_storage() -> AvatarStorage:
+    if settings.avatar_storage == "local":
+        return LocalStorage(settings.avatar_local_dir, settings.avatar_base_url)
+    return CloudinaryStorage(settings.cloudinary_name, settings.cloudinary_api_key, settings.cloudinary_api_secret)
+
+
+avatar_pipeline = AvatarPipeline(get_storage(), settings.avatar_size, settings.avatar_max_bytes, settings.avatar_workers)
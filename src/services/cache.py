@@ -0,0 +1,430 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.db.models import User
+from src.services.metrics import CACHE_REQUESTS
+
+
+@dataclass(frozen=True, slots=True)
+class CachedUser:
+
+    """
+    The part of a User that authenticated requests need.
+
+    Password hash and refresh token are deliberately left out, so they
+    never end up in Redis.
+    """
+
+    id: int
+    username: str
+    email: str
+    avatar: Optional[str]
+    created_at: Optional[datetime]
+    confirmed: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(user.id, user.username, user.email, user.avatar, user.created_at, bool(user.confirmed))
+
+    def dumps(self) -> str:
+        created_at = self.created_at.isoformat() if self.created_at else None
+        return json.dumps([self.id, self.username, self.email, self.avatar, created_at, self.confirmed],
+                          separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, raw: bytes | str) -> "CachedUser":
+        id, username, email, avatar, created_at, confirmed = json.loads(raw)
+        return cls(id, username, email, avatar, datetime.fromisoformat(created_at) if created_at else None, confirmed)
+
+
+class UserCache:
+
+    """
+    Two-tier cache of CachedUser by email.
+
+    A bounded in-process LRU sits in front of Redis, so most lookups touch
+    neither Redis nor Postgres. Redis entries are written with a single
+    ``SET ... EX``. Writes call ``invalidate``, which drops the Redis entry
+    and publishes the email on ``channel``; every worker running ``listen``
+    evicts its local copy.
+    """
+
+    prefix = "user:v2:"
+    channel = "user:invalidate"
+
+    def __init__(self, redis: Redis, ttl: int = 900, local_ttl: float = 30, local_size: int = 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        self.redis = redis
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self.clock = clock
+        self._local: OrderedDict[str, tuple[float, CachedUser]] = OrderedDict()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _get_local(self, email: str) -> CachedUser | None:
+        entry = self._local.get(email)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= self.clock():
+            del self._local[email]
+            return None
+        self._local.move_to_end(email)
+        return user
+
+    def _set_local(self, user: CachedUser) -> None:
+        self._local[user.email] = (self.clock() + self.local_ttl, user)
+        self._local.move_to_end(user.email)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def get(self, email: str) -> CachedUser | None:
+
+        """
+        Looks the user up in the local tier, then in Redis.
+
+        :param email: user email.
+        :type email: str
+        :return: cached user or None on a miss, also when Redis is down.
+        :rtype: CachedUser | None
+        """
+
+        user = self._get_local(email)
+        if user is not None:
+            self.local_hits += 1
+            CACHE_REQUESTS.labels("user", "local_hit").inc()
+            return user
+        try:
+            raw = await self.redis.get(self.prefix + email)
+        except RedisError as e:
+            print(e)
+            self.errors += 1
+            raw = None
+        if raw is None:
+            self.misses += 1
+            CACHE_REQUESTS.labels("user", "miss").inc()
+            return None
+        self.redis_hits += 1
+        CACHE_REQUESTS.labels("user", "redis_hit").inc()
+        user = CachedUser.loads(raw)
+        self._set_local(user)
+        return user
+
+    async def set(self, user: User) -> CachedUser:
+
+        """
+        Stores the user in both tiers, or only locally when Redis is down.
+
+        :param user: user loaded from the database.
+        :type user: User
+        :return: the cached copy.
+        :rtype: CachedUser
+        """
+
+        cached = CachedUser.from_user(user)
+        try:
+            await self.redis.set(self.prefix + cached.email, cached.dumps(), ex=self.ttl)
+        except RedisError as e:
+            print(e)
+            self.errors += 1
+        self._set_local(cached)
+        return cached
+
+    def evict(self, email: str) -> None:
+        self._local.pop(email, None)
+
+    async def invalidate(self, email: str) -> None:
+
+        """
+        Drops the user from Redis and from the local tier of every worker.
+
+        When Redis is down only this worker's copy is dropped; the others
+        expire within ``local_ttl``.
+
+        :param email: user email.
+        :type email: str
+        """
+
+        self.evict(email)
+        try:
+            await self.redis.delete(self.prefix + email)
+            await self.redis.publish(self.channel, email)
+        except RedisError as e:
+            print(e)
+            self.errors += 1
+
+    async def listen(self, retry_delay: float = 1.0) -> None:
+
+        """
+        Evicts local entries on invalidation events until cancelled.
+
+        Events published while the subscription is down are lost, so the
+        local tier is cleared every time it (re)subscribes.
+
+        :param retry_delay: seconds to wait before resubscribing after a Redis error.
+        :type retry_delay: float
+        """
+
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._local.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        data = message["data"]
+                        self.evict(data.decode() if isinstance(data, bytes) else data)
+            except RedisError as e:
+                print(e)
+                await asyncio.sleep(retry_delay)
+            finally:
+                await pubsub.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "local_size": len(self._local),
+        }
+
+
+class ClaimsCache:
+
+    """
+    Bounded LRU of verified JWT claims keyed by the token's SHA-256 digest.
+
+    Entries are kept until the token's ``exp``; tokens without ``exp`` are
+    never cached.
+    """
+
+    def __init__(self, size: int = 4096, clock: Callable[[], float] = time.time):
+        self.size = size
+        self.clock = clock
+        self._claims: OrderedDict[bytes, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        claims = self._claims.get(key)
+        if claims is None or claims["exp"] <= self.clock():
+            self._claims.pop(key, None)
+            self.misses += 1
+            CACHE_REQUESTS.labels("jwt", "miss").inc()
+            return None
+        self._claims.move_to_end(key)
+        self.hits += 1
+        CACHE_REQUESTS.labels("jwt", "hit").inc()
+        return claims
+
+    def set(self, token: str, claims: dict) -> None:
+        if self.size <= 0 or "exp" not in claims:
+            return
+        key = self._key(token)
+        self._claims[key] = claims
+        self._claims.move_to_end(key)
+        while len(self._claims) > self.size:
+            self._claims.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._claims)}
+
+
+# A missing version is created from the Redis clock in microseconds, so it is
+# larger than any version handed out before the key was lost.
+NEW_VERSION = """
+local clock = redis.call('TIME')
+local new = clock[1] .. string.format('%06d', tonumber(clock[2]))
+"""
+
+# Returns the user's contacts version and, unless the client already has that
+# version, the cached body and headers of the view.
+CONTACTS_LOOKUP = NEW_VERSION + """
+local version = redis.call('GET', KEYS[1])
+if not version then
+    redis.call('SET', KEYS[1], new, 'NX')
+    version = redis.call('GET', KEYS[1])
+end
+if version == ARGV[2] then
+    return {version}
+end
+local entry = redis.call('HMGET', ARGV[1] .. version .. ':' .. ARGV[3], 'body', 'headers')
+return {version, entry[1], entry[2]}
+"""
+
+CONTACTS_BUMP = NEW_VERSION + """
+if tonumber(ARGV[1]) > 0 then
+    redis.call('SET', KEYS[2], 1, 'EX', ARGV[1])
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCR', KEYS[1])
+end
+redis.call('SET', KEYS[1], new)
+return new
+"""
+
+
+class ContactsCache:
+
+    """
+    Conditional GET and serialized response bodies for contact reads.
+
+    Every user has a contacts version that contact writes bump. A view
+    (route plus query parameters) gets the ETag ``"<version>.<view hash>"``
+    and its JSON body is cached in Redis under the same pair, so an
+    unchanged address book costs one script call: 304 when the client sent
+    the current ETag, otherwise the cached body. The version is read before
+    the query runs and bumped after the write commits, so a cached body is
+    never older than its version. Without Redis responses are built
+    uncached.
+
+    A bump also marks the user as recently written for ``replica_lag``
+    seconds, so reads that would otherwise go to a lagging replica (and
+    cache what it returns under the new version) use the primary instead.
+    """
+
+    prefix = "contacts:"
+
+    def __init__(self, redis: Redis, ttl: int = 3600, replica_lag: int = 0):
+        self.redis = redis
+        self.ttl = ttl
+        self.replica_lag = replica_lag
+        self._lookup = redis.register_script(CONTACTS_LOOKUP)
+        self._bump = redis.register_script(CONTACTS_BUMP)
+        self.not_modified = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _version_key(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}:version"
+
+    def _body_prefix(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}:body:"
+
+    def _written_key(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}:written"
+
+    @staticmethod
+    def client_version(request: Request, view_key: str) -> str:
+        for tag in request.headers.get("if-none-match", "").split(","):
+            tag = tag.strip().removeprefix("W/")
+            if tag.startswith('"') and tag.endswith(f'.{view_key}"'):
+                return tag[1:].split(".", 1)[0]
+        return ""
+
+    async def bump(self, user_id: int) -> None:
+
+        """
+        Marks every cached view of the user's contacts as stale.
+
+        :param user_id: owner of the contacts.
+        :type user_id: int
+        """
+
+        try:
+            await self._bump(keys=[self._version_key(user_id), self._written_key(user_id)], args=[self.replica_lag])
+        except RedisError as e:
+            print(e)
+            self.errors += 1
+
+    async def recently_written(self, user_id: int) -> bool:
+
+        """
+        Whether the user's contacts changed within the last ``replica_lag`` seconds.
+
+        :param user_id: owner of the contacts.
+        :type user_id: int
+        :return: True also when Redis can't tell, so callers fall back to the primary.
+        :rtype: bool
+        """
+
+        try:
+            return bool(await self.redis.exists(self._written_key(user_id)))
+        except RedisError as e:
+            print(e)
+            self.errors += 1
+            return True
+
+    async def respond(self, request: Request, user_id: int, view: str,
+                      build: Callable[[], Awaitable[tuple[bytes, dict]]]) -> Response:
+
+        """
+        Answers a contact read from the cache, or with ``build`` on a miss.
+
+        :param request: request, for its If-None-Match header.
+        :type request: Request
+        :param user_id: owner of the contacts.
+        :type user_id: int
+        :param view: route and query parameters that identify the response.
+        :type view: str
+        :param build: coroutine function returning the JSON body and extra headers.
+        :type build: Callable[[], Awaitable[tuple[bytes, dict]]]
+        :return: 304, cached or freshly built JSON response.
+        :rtype: Response
+        """
+
+        view_key = hashlib.sha1(view.encode()).hexdigest()[:16]
+        client_version = self.client_version(request, view_key)
+        try:
+            version, *entry = await self._lookup(keys=[self._version_key(user_id)],
+                                                 args=[self._body_prefix(user_id), client_version, view_key])
+        except RedisError as e:
+            print(e)
+            self.errors += 1
+            body, headers = await build()
+            return Response(body, media_type="application/json", headers=headers)
+        version = version.decode()
+        cache_headers = {"ETag": f'"{version}.{view_key}"', "Cache-Control": "private, no-cache"}
+        if version == client_version:
+            self.not_modified += 1
+            CACHE_REQUESTS.labels("contacts", "not_modified").inc()
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+        if entry and entry[0] is not None:
+            self.hits += 1
+            CACHE_REQUESTS.labels("contacts", "hit").inc()
+            return Response(entry[0], media_type="application/json", headers={**json.loads(entry[1]), **cache_headers})
+        self.misses += 1
+        CACHE_REQUESTS.labels("contacts", "miss").inc()
+        body, headers = await build()
+        key = f"{self._body_prefix(user_id)}{version}:{view_key}"
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hset(key, mapping={"body": body, "headers": json.dumps(headers)})
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+        except RedisError as e:
+            print(e)
+            self.errors += 1
+        return Response(body, media_type="application/json", headers={**headers, **cache_headers})
+
+    def stats(self) -> dict:
+        return {"not_modified": self.not_modified, "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+redis_client = Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+user_cache = UserCache(redis_client, ttl=settings.user_cache_ttl, local_ttl=settings.user_cache_local_ttl,
+                       local_size=settings.user_cache_local_size)
+contacts_cache = ContactsCache(redis_client, ttl=settings.contacts_cache_ttl,
+                               replica_lag=settings.db_replica_lag if settings.sqlalchemy_replica_url else 0)
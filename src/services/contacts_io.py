@@ -0,0 +1,190 @@
+import codecs
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, List, Tuple
+
+from pydantic import TypeAdapter
+
+from src.db.models import Contact
+from src.schemas import ContactResponse
+
+ParsedRow = Tuple[int, dict | None, str | None]
+Batches = AsyncIterator[List[Contact]]
+
+ContactList = TypeAdapter(List[ContactResponse])
+
+EXPORT_FIELDS = ["id", "name", "lastname", "email", "phone", "birthday", "additional", "contact_date"]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+
+    """
+    Splits a stream of byte chunks into text lines without buffering the whole body.
+
+    :param chunks: UTF-8 encoded body chunks.
+    :type chunks: AsyncIterator[bytes]
+    :return: lines without line endings.
+    :rtype: AsyncIterator[str]
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def parse_csv(lines: AsyncIterator[str]) -> AsyncIterator[ParsedRow]:
+
+    """
+    Parses CSV with a header line into dicts, one line per record.
+
+    Quoted fields may contain commas but not line breaks.
+
+    :param lines: CSV lines.
+    :type lines: AsyncIterator[str]
+    :return: row number, parsed row or None, error or None.
+    :rtype: AsyncIterator[ParsedRow]
+    """
+
+    header = None
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, None, f"expected {len(header)} fields, got {len(values)}"
+            continue
+        yield row_number, dict(zip(header, values)), None
+
+
+async def parse_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[ParsedRow]:
+
+    """
+    Parses NDJSON, one JSON object per line.
+
+    :param lines: NDJSON lines.
+    :type lines: AsyncIterator[str]
+    :return: row number, parsed row or None, error or None.
+    :rtype: AsyncIterator[ParsedRow]
+    """
+
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "expected a JSON object"
+            continue
+        yield row_number, row, None
+
+
+parsers = {"csv": parse_csv, "ndjson": parse_ndjson}
+
+
+def to_json(contacts: List[Contact]) -> bytes:
+    return ContactList.dump_json(ContactList.validate_python(contacts, from_attributes=True))
+
+
+async def to_ndjson(batches: Batches) -> AsyncIterator[str]:
+    async for batch in batches:
+        yield "".join(ContactResponse.model_validate(contact, from_attributes=True).model_dump_json() + "\n"
+                      for contact in batch)
+
+
+async def to_csv(batches: Batches) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([getattr(contact, field) for field in EXPORT_FIELDS] for contact in batch)
+        yield buffer.getvalue()
+
+
+def _vcard_escape(value) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\n", "\\n")
+
+
+def vcard(contact: Contact) -> str:
+
+    """
+    Formats a contact as a vCard 3.0 entry.
+
+    :param contact: contact to format.
+    :type contact: Contact
+    :return: vCard with CRLF line endings.
+    :rtype: str
+    """
+
+    name, lastname = _vcard_escape(contact.name), _vcard_escape(contact.lastname)
+    lines = [
+        "BEGIN:VCARD",
+        "VERSION:3.0",
+        f"N:{lastname};{name};;;",
+        f"FN:{name} {lastname}",
+        f"EMAIL;TYPE=INTERNET:{_vcard_escape(contact.email)}",
+        f"TEL:{_vcard_escape(contact.phone)}",
+    ]
+    if contact.birthday:
+        lines.append(f"BDAY:{contact.birthday.isoformat()}")
+    if contact.additional:
+        lines.append(f"NOTE:{_vcard_escape(contact.additional)}")
+    lines.append("END:VCARD")
+    return "\r\n".join(lines) + "\r\n"
+
+
+async def to_vcard(batches: Batches) -> AsyncIterator[str]:
+    async for batch in batches:
+        yield "".join(vcard(contact) for contact in batch)
+
+
+async def gzip_stream(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+
+    """
+    Gzips a text stream chunk by chunk.
+
+    Every chunk is sync-flushed so the client receives data as soon as it
+    is produced.
+
+    :param chunks: text chunks.
+    :type chunks: AsyncIterator[str]
+    :return: gzip member split into chunks.
+    :rtype: AsyncIterator[bytes]
+    """
+
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+formatters = {
+    "csv": (to_csv, "text/csv", "csv"),
+    "ndjson": (to_ndjson, "application/x-ndjson", "ndjson"),
+    "vcard": (to_vcard, "text/vcard", "vcf"),
+}
@@ -1,40 +1,191 @@
+import asyncio
+import math
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pydantic import EmailStr
 
 from src.services.auth import auth_service
 
 from src.conf.config import settings
+from src.services.metrics import EMAIL_SEND_DURATION
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="Desired Name",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
+
+class MailSender:
+
+    """
+    Long-lived SMTP sender with a pool of authenticated connections.
+
+    ``send`` puts the message on a queue. Each of ``pool_size`` workers
+    keeps one SMTP connection open, takes its share of the queued messages
+    (at most ``batch_size``) and sends them over that connection, so a burst
+    is spread over every connection of the pool. A message that
+    fails is retried ``retries`` times with exponential backoff, on a fresh
+    connection, before its error is raised to the caller. Templates are
+    compiled once and cached by the Jinja environment.
+    """
+
+    def __init__(self, hostname: str, port: int, username: str | None, password: str | None,
+                 from_address: str, from_name: str, use_tls: bool = True, start_tls: bool = False,
+                 validate_certs: bool = True, pool_size: int = 4, batch_size: int = 100,
+                 retries: int = 3, backoff: float = 0.5, template_folder: Path = Path(__file__).parent / 'templates'):
+        self.smtp_options = dict(hostname=hostname, port=port, username=username or None, password=password or None,
+                                 use_tls=use_tls, start_tls=start_tls, validate_certs=validate_certs)
+        self.sender = formataddr((from_name, from_address))
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.templates = Environment(loader=FileSystemLoader(template_folder), autoescape=select_autoescape())
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def render(self, template_name: str, body: dict) -> str:
+        return self.templates.get_template(template_name).render(**body)
+
+    def message(self, recipient: str, subject: str, template_name: str, body: dict) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(self.render(template_name, body), subtype="html")
+        return message
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.pool_size)]
+
+    async def stop(self) -> None:
+
+        """
+        Waits for queued messages to be sent, then closes the connections.
+        """
+
+        if not self._workers:
+            return
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def send(self, recipient: str, subject: str, template_name: str, body: dict) -> None:
+
+        """
+        Queues a templated HTML email and waits until it is sent.
+
+        :param recipient: recipient address.
+        :type recipient: str
+        :param subject: subject.
+        :type subject: str
+        :param template_name: template file in the templates folder.
+        :type template_name: str
+        :param body: template variables.
+        :type body: dict
+        :raises SMTPException: if the message could not be sent after all retries.
+        """
+
+        self.start()
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((self.message(recipient, subject, template_name, body), done))
+        await done
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(**self.smtp_options)
+        await smtp.connect()
+        return smtp
+
+    async def _send_one(self, smtp: aiosmtplib.SMTP | None, message: EmailMessage) -> aiosmtplib.SMTP | None:
+        for attempt in range(self.retries + 1):
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self._connect()
+                await smtp.send_message(message)
+                return smtp
+            except (aiosmtplib.SMTPException, OSError):
+                if smtp is not None:
+                    smtp.close()
+                smtp = None
+                if attempt == self.retries:
+                    raise
+                self.retried += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def _work(self) -> None:
+        smtp = None
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                # Leave the rest of the queue to the other workers' connections.
+                share = min(self.batch_size, math.ceil((self._queue.qsize() + 1) / self.pool_size))
+                while len(batch) < share and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                for message, done in batch:
+                    started = time.perf_counter()
+                    try:
+                        smtp = await self._send_one(smtp, message)
+                        self.sent += 1
+                        EMAIL_SEND_DURATION.labels("sent").observe(time.perf_counter() - started)
+                        if not done.done():
+                            done.set_result(None)
+                    except Exception as e:
+                        self.failed += 1
+                        EMAIL_SEND_DURATION.labels("failed").observe(time.perf_counter() - started)
+                        if not done.done():
+                            done.set_exception(e)
+                    finally:
+                        self._queue.task_done()
+        finally:
+            if smtp is not None and smtp.is_connected:
+                smtp.close()
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "failed": self.failed, "retried": self.retried,
+                "queued": self._queue.qsize() if self._queue else 0}
+
+
+mail_sender = MailSender(
+    hostname=settings.mail_server,
+    port=settings.mail_port,
+    username=settings.mail_username,
+    password=settings.mail_password,
+    from_address=settings.mail_from,
+    from_name="Desired Name",
+    use_tls=settings.mail_ssl_tls,
+    start_tls=settings.mail_starttls,
+    pool_size=settings.mail_pool_size,
+    batch_size=settings.mail_batch_size,
+    retries=settings.mail_retries,
+    backoff=settings.mail_retry_backoff,
 )
 
 
 async def send_email(email: EmailStr, username: str, host: str):
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+    token_verification = auth_service.create_email_token({"sub": email})
+    await mail_sender.send(email, "Confirm your email ", "email_template.html",
+                           {"host": host, "username": username, "token": token_verification})
+
+
+async def send_birthday_digest(email: EmailStr, username: str, contacts: list):
+
+    """
+    Sends the list of contacts celebrating a birthday today.
+
+    :param email: recipient.
+    :type email: EmailStr
+    :param username: recipient name.
+    :type username: str
+    :param contacts: contacts with name, lastname, email and phone.
+    :type contacts: list
+    """
 
+    await mail_sender.send(email, "Birthdays today", "birthday_digest.html", {"username": username, "contacts": contacts})
@@ -0,0 +1,141 @@
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# With several uvicorn workers every process writes its samples to files in
+# PROMETHEUS_MULTIPROC_DIR (which must be set and emptied before the workers
+# start), and /metrics merges them, so any worker can answer the scrape.
+
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being handled.", ["method"], multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_seconds", "Time to check a connection out of the SQLAlchemy pool.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by statement type.", ["operation"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"],
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "bcrypt time by operation, excluding the wait for a worker.", ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2.5, 5),
+)
+EMAIL_SEND_DURATION = Histogram(
+    "email_send_duration_seconds", "Time to send one email over SMTP, retries included.", ["result"],
+)
+
+
+def multiprocess_dir() -> str | None:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def render() -> tuple[bytes, str]:
+
+    """
+    Current metrics in the Prometheus text format, merged across worker processes.
+
+    :return: body and content type.
+    :rtype: tuple[bytes, str]
+    """
+
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+
+    """
+    Records latency and in-flight requests of every HTTP request.
+
+    The route label is the path template the router matched, such as
+    ``/contacts/{contact_id}``, so ids don't create new series. Requests
+    that match no route are labelled ``unmatched``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_DURATION.labels(method, route, str(status)).observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+
+    """
+    Async queue pool that records how long each checkout waits for a connection.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine: Engine) -> None:
+
+    """
+    Records the execution time of every statement run on ``engine``.
+
+    :param engine: engine to instrument, ``AsyncEngine.sync_engine`` for async engines.
+    :type engine: Engine
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip()[:6].upper()
+        DB_QUERY_DURATION.labels(operation if operation in SQL_OPERATIONS else "OTHER").observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
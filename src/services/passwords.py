@@ -0,0 +1,111 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from src.conf.config import settings
+from src.services.metrics import PASSWORD_HASH_DURATION
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.password_hash_rounds)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordPool:
+
+    """
+    Runs bcrypt on a bounded thread or process pool instead of the event loop.
+
+    At most ``workers`` hashes run at once; up to ``max_queue`` more wait for
+    a slot, and further calls are rejected with 503 rather than piling up.
+    Hashes made with another cost factor are rehashed on a successful
+    verify, so ``password_hash_rounds`` can be changed without a migration.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 100, kind: str = "thread"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self._executor: Executor | None = None
+        self._slots = asyncio.Semaphore(workers)
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            pool = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, operation: str, fn, *args):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is busy, try again later")
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.wait_seconds += started - queued_at
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.running -= 1
+            self.completed += 1
+            self.run_seconds += elapsed
+            PASSWORD_HASH_DURATION.labels(operation).observe(elapsed)
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+
+        """
+        Verifies the password and rehashes it if the stored cost factor is outdated.
+
+        :param plain_password: password sent by the user.
+        :type plain_password: str
+        :param hashed_password: stored hash.
+        :type hashed_password: str
+        :return: whether the password matches, and the new hash to store or None.
+        :rtype: tuple[bool, str | None]
+        """
+
+        return await self._run("verify", _verify_and_update, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_total": round(self.wait_seconds, 6),
+            "run_seconds_total": round(self.run_seconds, 6),
+        }
+
+
+password_pool = PasswordPool(settings.password_hash_workers, settings.password_hash_queue, settings.password_hash_executor)
@@ -0,0 +1,156 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.conf.config import settings
+
+
+class RequestProfile:
+
+    """
+    Queries run while handling one request.
+
+    ``statements`` counts executions per SQL text; since the text has
+    placeholders instead of values, the same query run for every row of a
+    result shows up as one statement with a high count. ``lazy_loads``
+    counts ORM loads triggered by attribute access, such as ``Contact.user``
+    or reloading an expired object.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements: Counter[str] = Counter()
+        self.lazy_loads: Counter[str] = Counter()
+
+    def n_plus_one(self, threshold: int) -> list[str]:
+
+        """
+        Repeated statements and lazy loads that look like N+1 patterns.
+
+        :param threshold: executions of the same statement that count as a pattern.
+        :type threshold: int
+        :return: descriptions with their counts.
+        :rtype: list[str]
+        """
+
+        found = [f"{load} x{count}" for load, count in self.lazy_loads.items() if count >= threshold]
+        found += [f"{' '.join(sql.split())[:80]} x{count}" for sql, count in self.statements.items() if count >= threshold]
+        return found
+
+    def server_timing(self, threshold: int) -> str:
+        timing = f'db;dur={self.seconds * 1000:.2f};desc="{self.queries} queries"'
+        if self.lazy_loads:
+            timing += f', lazy;desc="{sum(self.lazy_loads.values())} lazy loads"'
+        if self.n_plus_one(threshold):
+            timing += ', n-plus-one;desc="repeated queries"'
+        return timing
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+
+    """
+    Describes bound parameters by type only, so values never reach the log.
+
+    :param parameters: DBAPI parameters.
+    :param executemany: whether ``parameters`` holds one set per row.
+    :type executemany: bool
+    :return: e.g. ``{user_id: int, name: str}`` or ``500 x (int, str)``.
+    :rtype: str
+    """
+
+    if executemany:
+        return f"{len(parameters)} x {parameter_shape(parameters[0], False)}" if parameters else "0 rows"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters or ()) + ")"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is None or not hasattr(context, "_profile_started"):
+        return
+    elapsed = time.perf_counter() - context._profile_started
+    profile.queries += 1
+    profile.seconds += elapsed
+    profile.statements[statement] += 1
+    if elapsed * 1000 >= settings.sql_slow_query_ms:
+        print(f"Slow query {elapsed * 1000:.1f} ms: {' '.join(statement.split())} "
+              f"params {parameter_shape(parameters, executemany)}")
+
+
+def _do_orm_execute(orm_execute_state: ORMExecuteState):
+    profile = current_profile.get()
+    if profile is None:
+        return
+    target = orm_execute_state.bind_mapper.class_.__name__ if orm_execute_state.bind_mapper else "?"
+    if orm_execute_state.lazy_loaded_from is not None:
+        profile.lazy_loads[f"{orm_execute_state.lazy_loaded_from.class_.__name__} -> {target}"] += 1
+    elif orm_execute_state.is_column_load:
+        profile.lazy_loads[f"reload {target}"] += 1
+
+
+def install(engine: Engine) -> None:
+
+    """
+    Starts recording queries of ``engine`` and ORM lazy loads for profiled requests.
+
+    :param engine: engine to profile, ``AsyncEngine.sync_engine`` for async engines.
+    :type engine: Engine
+    """
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    if not event.contains(Session, "do_orm_execute", _do_orm_execute):
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+
+
+class SQLProfilingMiddleware:
+
+    """
+    Profiles the queries of every HTTP request.
+
+    Adds a ``Server-Timing`` header with the query count and time, and
+    prints the route with its repeated statements and lazy loads when they
+    reach ``settings.sql_n_plus_one_threshold``. Streaming responses only
+    report the queries run before the body started.
+    """
+
+    def __init__(self, app: ASGIApp, threshold: int | None = None):
+        self.app = app
+        self.threshold = threshold or settings.sql_n_plus_one_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", profile.server_timing(self.threshold))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            n_plus_one = profile.n_plus_one(self.threshold)
+            if n_plus_one:
+                route = getattr(scope.get("route"), "path", scope["path"])
+                print(f"Possible N+1 in {scope['method']} {route}: {'; '.join(n_plus_one)}")
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import time
+import traceback
+import uuid
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from src.conf.config import settings
+from src.services.cache import redis_client
+
+
+# Takes a job off a worker's processing list and records how it went, in one
+# step so it can be retried after an error: once the job is gone from the
+# processing list (a previous call got through), it does nothing and returns 0.
+# ARGV: raw job, outcome ('succeeded', 'retried' or 'dead'), job to store,
+# retry time, seconds waited in the queue, seconds run.
+FINISH = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+if ARGV[2] == 'retried' then
+    redis.call('ZADD', KEYS[2], ARGV[4], ARGV[3])
+elseif ARGV[2] == 'dead' then
+    redis.call('LPUSH', KEYS[3], ARGV[3])
+end
+redis.call('HINCRBY', KEYS[4], ARGV[2], 1)
+redis.call('HINCRBYFLOAT', KEYS[4], 'wait_seconds_total', ARGV[5])
+redis.call('HINCRBYFLOAT', KEYS[4], 'run_seconds_total', ARGV[6])
+return 1
+"""
+
+# Moves delayed jobs due by ARGV[1] (at most ARGV[2]) to the ready list, in
+# one step so a job is never out of both structures.
+PROMOTE = """
+local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(jobs) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('LPUSH', KEYS[2], job)
+end
+return #jobs
+"""
+
+
+class JobQueue:
+
+    """
+    Durable job queue on top of Redis lists.
+
+    ``enqueue`` pushes a JSON job to ``<name>:ready``. Workers atomically move
+    jobs into their own ``<name>:processing:<worker id>`` list while running
+    them, so a job held by a worker that dies (its heartbeat key expires) is
+    put back on the ready list by the next reaper pass. Failed jobs are
+    retried with exponential backoff through the ``<name>:delayed`` sorted
+    set and moved to ``<name>:dead`` after ``max_retries`` retries; a reaped
+    job counts as a failed attempt too, so a job that keeps killing workers
+    ends up there as well. Counters shared by all workers live in the
+    ``<name>:stats`` hash. Workers outlive Redis outages: on a Redis error
+    they wait ``retry_delay`` seconds and carry on, and a job that has run is
+    kept on the processing list until its outcome is recorded.
+    """
+
+    def __init__(self, redis: Redis, name: str = "jobs", max_retries: int = 5, backoff: float = 2.0,
+                 heartbeat_ttl: int = 30, retry_delay: float = 1.0):
+        self.redis = redis
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.heartbeat_ttl = heartbeat_ttl
+        self.retry_delay = retry_delay
+        self.tasks: dict[str, Callable[..., Awaitable]] = {}
+        self.ready = f"{name}:ready"
+        self.delayed = f"{name}:delayed"
+        self.dead = f"{name}:dead"
+        self.stats_key = f"{name}:stats"
+        self._finish_script = redis.register_script(FINISH)
+        self._promote_script = redis.register_script(PROMOTE)
+
+    def register(self, name: str, fn: Callable[..., Awaitable]) -> None:
+        self.tasks[name] = fn
+
+    async def enqueue(self, task: str, *args, **kwargs) -> str:
+
+        """
+        Adds a job for a worker to run.
+
+        :param task: registered task name.
+        :type task: str
+        :param args: JSON serializable positional arguments.
+        :param kwargs: JSON serializable keyword arguments.
+        :return: job id.
+        :rtype: str
+        """
+
+        job = {"id": uuid.uuid4().hex, "task": task, "args": args, "kwargs": kwargs,
+               "attempts": 0, "enqueued_at": time.time()}
+        await self.redis.lpush(self.ready, json.dumps(job))
+        return job["id"]
+
+    async def promote_delayed(self, now: float | None = None, limit: int = 100) -> int:
+
+        """
+        Moves delayed jobs whose retry time has come back to the ready list.
+
+        A Lua script does the move, so concurrent callers never push the
+        same job twice and a job is not lost if the caller dies halfway.
+
+        :return: number of jobs moved.
+        :rtype: int
+        """
+
+        return await self._promote_script(keys=[self.delayed, self.ready], args=[now or time.time(), limit])
+
+    async def reap(self) -> int:
+
+        """
+        Puts back jobs held by workers whose heartbeat has expired.
+
+        The job may be what killed the worker, so the attempt is counted and
+        a job past ``max_retries`` goes to the dead list instead.
+
+        :return: number of jobs taken from dead workers.
+        :rtype: int
+        """
+
+        moved = 0
+        async for key in self.redis.scan_iter(match=f"{self.name}:processing:*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            worker_id = key.rsplit(":", 1)[1]
+            if await self.redis.exists(f"{self.name}:worker:{worker_id}"):
+                continue
+            while await self._reap_one(key, worker_id):
+                moved += 1
+        return moved
+
+    async def _reap_one(self, processing: str, worker_id: str) -> bool:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    # WATCH makes the move fail if another reaper takes the job first.
+                    await pipe.watch(processing)
+                    raw = await pipe.lindex(processing, -1)
+                    if raw is None:
+                        return False
+                    job = json.loads(raw)
+                    job["attempts"] += 1
+                    job["error"] = f"worker {worker_id} stopped while running the job"
+                    pipe.multi()
+                    pipe.rpop(processing)
+                    if job["attempts"] > self.max_retries:
+                        pipe.lpush(self.dead, json.dumps(job))
+                        pipe.hincrby(self.stats_key, "dead", 1)
+                    else:
+                        pipe.lpush(self.ready, json.dumps(job))
+                        pipe.hincrby(self.stats_key, "retried", 1)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    async def _finish(self, processing: str, raw: bytes, job: dict, error: str | None, waited: float,
+                      ran: float, stop: asyncio.Event) -> None:
+        if error is None:
+            outcome, retry_at = "succeeded", 0
+        else:
+            job = {**job, "attempts": job["attempts"] + 1, "error": error}
+            outcome = "dead" if job["attempts"] > self.max_retries else "retried"
+            retry_at = time.time() + self.backoff ** job["attempts"]
+        while True:
+            try:
+                await self._finish_script(keys=[processing, self.delayed, self.dead, self.stats_key],
+                                          args=[raw, outcome, json.dumps(job), retry_at, f"{waited:.6f}", f"{ran:.6f}"])
+                return
+            except RedisError as e:
+                print(e)
+                if stop.is_set():
+                    # The heartbeat stops with the worker, so the reaper puts the job back.
+                    return
+                await self._wait(stop, self.retry_delay)
+
+    async def _run_one(self, processing: str, raw: bytes, stop: asyncio.Event) -> None:
+        job = json.loads(raw)
+        started = time.time()
+        error = None
+        try:
+            task = self.tasks[job["task"]]
+            await task(*job["args"], **job["kwargs"])
+        except Exception:
+            error = traceback.format_exc(limit=5)
+            print(error)
+        await self._finish(processing, raw, job, error, started - job["enqueued_at"], time.time() - started, stop)
+
+    @staticmethod
+    async def _wait(stop: asyncio.Event, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(stop.wait(), seconds)
+        except TimeoutError:
+            pass
+
+    async def _consume(self, processing: str, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            try:
+                raw = await self.redis.blmove(self.ready, processing, 1, "RIGHT", "LEFT")
+            except RedisError as e:
+                print(e)
+                await self._wait(stop, self.retry_delay)
+                continue
+            if raw is not None:
+                await self._run_one(processing, raw, stop)
+
+    async def _maintain(self, worker_id: str, stop: asyncio.Event) -> None:
+        last_reap = 0.0
+        while not stop.is_set():
+            try:
+                await self.redis.set(f"{self.name}:worker:{worker_id}", 1, ex=self.heartbeat_ttl)
+                await self.promote_delayed()
+                if time.monotonic() - last_reap > self.heartbeat_ttl:
+                    await self.reap()
+                    last_reap = time.monotonic()
+            except RedisError as e:
+                print(e)
+                await self._wait(stop, self.retry_delay)
+                continue
+            await self._wait(stop, 1)
+
+    async def work(self, concurrency: int = 10, stop: asyncio.Event | None = None) -> None:
+
+        """
+        Runs jobs with ``concurrency`` consumers until ``stop`` is set.
+
+        Jobs already taken are finished before returning.
+
+        :param concurrency: number of jobs run at once.
+        :type concurrency: int
+        :param stop: event that ends the loop, never set by default.
+        :type stop: asyncio.Event | None
+        """
+
+        stop = stop or asyncio.Event()
+        worker_id = uuid.uuid4().hex
+        processing = f"{self.name}:processing:{worker_id}"
+        await self.redis.set(f"{self.name}:worker:{worker_id}", 1, ex=self.heartbeat_ttl)
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(self._maintain(worker_id, stop))
+                for _ in range(concurrency):
+                    tasks.create_task(self._consume(processing, stop))
+        finally:
+            await self.redis.delete(f"{self.name}:worker:{worker_id}")
+
+    async def stats(self) -> dict:
+
+        """
+        Queue depths and counters aggregated over all workers.
+
+        :return: counters.
+        :rtype: dict
+        """
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.llen(self.ready)
+        pipe.zcard(self.delayed)
+        pipe.llen(self.dead)
+        pipe.hgetall(self.stats_key)
+        ready, delayed, dead, counters = await pipe.execute()
+        counters = {(k.decode() if isinstance(k, bytes) else k): float(v) for k, v in counters.items()}
+        started = counters.get("succeeded", 0) + counters.get("retried", 0) + counters.get("dead", 0)
+        return {
+            "ready": ready,
+            "delayed": delayed,
+            "dead": dead,
+            **counters,
+            "avg_wait_seconds": counters.get("wait_seconds_total", 0) / started if started else 0.0,
+        }
+
+
+job_queue = JobQueue(redis_client, settings.queue_name, settings.queue_max_retries, settings.queue_retry_backoff)
@@ -0,0 +1,170 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.services.auth import auth_service
+from src.services.cache import CachedUser, redis_client
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Refills the bucket for the time elapsed since the last call (by the Redis
+# clock, so all app processes agree), then takes ``cost`` tokens if there are
+# enough. Returns 1 or 0, the tokens left and the seconds until ``cost``
+# tokens are available.
+TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens), tostring(wait)}
+"""
+
+
+def parse_limit(limit: str) -> tuple[float, int]:
+
+    """
+    Parses a limit like ``5/minute``.
+
+    :param limit: requests per second, minute, hour or day.
+    :type limit: str
+    :return: refill rate in tokens per second and bucket capacity.
+    :rtype: tuple[float, int]
+    """
+
+    count, period = limit.split("/")
+    return int(count) / PERIODS[period.strip()], int(count)
+
+
+class RateLimiter:
+
+    """
+    Token buckets kept in Redis and updated atomically by a Lua script.
+
+    When Redis rejects a request it also says how long the bucket needs to
+    refill, and the key is blocked in-process until then. Other processes
+    can only take tokens from the bucket, so further requests in that window
+    are rejected without a Redis round trip and without false rejections.
+    If Redis is unavailable requests are let through.
+    """
+
+    def __init__(self, redis: Redis, prefix: str = "rate:", local_size: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.redis = redis
+        self.prefix = prefix
+        self.local_size = local_size
+        self.clock = clock
+        self.script = redis.register_script(TOKEN_BUCKET)
+        self._blocked: OrderedDict[str, float] = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+        self.rejected_locally = 0
+        self.errors = 0
+
+    def _block(self, key: str, until: float) -> None:
+        self._blocked[key] = until
+        self._blocked.move_to_end(key)
+        while len(self._blocked) > self.local_size:
+            self._blocked.popitem(last=False)
+
+    async def hit(self, key: str, rate: float, capacity: int, cost: int = 1) -> tuple[float, float]:
+
+        """
+        Takes ``cost`` tokens from the bucket of ``key``.
+
+        :param key: bucket name.
+        :type key: str
+        :param rate: refill rate in tokens per second.
+        :type rate: float
+        :param capacity: bucket size.
+        :type capacity: int
+        :param cost: tokens the request needs.
+        :type cost: int
+        :return: seconds to wait, 0 if the request is allowed, and tokens left.
+        :rtype: tuple[float, float]
+        """
+
+        now = self.clock()
+        until = self._blocked.get(key)
+        if until is not None:
+            if until > now:
+                self.rejected_locally += 1
+                return until - now, 0.0
+            del self._blocked[key]
+        try:
+            allowed, tokens, wait = await self.script(keys=[self.prefix + key], args=[rate, capacity, cost])
+        except RedisError as e:
+            print(e)
+            self.errors += 1
+            return 0.0, float(capacity)
+        if allowed:
+            self.allowed += 1
+            return 0.0, float(tokens)
+        self.rejected += 1
+        wait = float(wait)
+        self._block(key, now + wait)
+        return wait, float(tokens)
+
+    def stats(self) -> dict:
+        return {"allowed": self.allowed, "rejected": self.rejected, "rejected_locally": self.rejected_locally,
+                "errors": self.errors, "blocked_keys": len(self._blocked)}
+
+
+rate_limiter = RateLimiter(redis_client, local_size=settings.rate_limit_local_size)
+
+
+class RateLimit:
+
+    """
+    Dependency that limits a route per client IP.
+
+    The limit is looked up by ``name`` in ``settings.rate_limits``, falling
+    back to ``settings.rate_limit_default``.
+    """
+
+    def __init__(self, name: str, limiter: RateLimiter = rate_limiter):
+        self.name = name
+        self.limiter = limiter
+        self.rate, self.capacity = parse_limit(settings.rate_limits.get(name, settings.rate_limit_default))
+
+    async def check(self, identity: str, response: Response) -> None:
+        if not settings.rate_limit_enabled:
+            return
+        wait, tokens = await self.limiter.hit(f"{self.name}:{identity}", self.rate, self.capacity)
+        if wait:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests",
+                                headers={"Retry-After": str(math.ceil(wait))})
+        response.headers["X-RateLimit-Remaining"] = str(int(tokens))
+
+    async def __call__(self, request: Request, response: Response) -> None:
+        await self.check(f"ip:{request.client.host if request.client else 'unknown'}", response)
+
+
+class UserRateLimit(RateLimit):
+
+    """
+    Dependency that limits a route per logged in user.
+    """
+
+    async def __call__(self, response: Response, current_user: CachedUser = Depends(auth_service.get_current_user)) -> None:
+        await self.check(f"user:{current_user.id}", response)
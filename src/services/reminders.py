@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+from datetime import date, datetime, time, timedelta
+
+from src.conf.config import settings
+from src.db.db import AsyncSessionLocal
+from src.repository import reminders as repository_reminders
+from src.repository.reminders import Digest
+from src.services.email import send_birthday_digest
+
+
+async def send_daily_digests(day: date, shard: int = 0, shards: int = 1, concurrency: int = settings.reminder_concurrency) -> dict:
+
+    """
+    Sends today's birthday digests, at most ``concurrency`` at a time.
+
+    Safe to re-run: digests already sent, or being sent by another worker,
+    are skipped, and failed ones are retried. Workers can split users
+    between them with ``shard``/``shards``.
+
+    :param day: the day.
+    :type day: date
+    :param shard: shard number, 0 based.
+    :type shard: int
+    :param shards: total number of shards.
+    :type shards: int
+    :param concurrency: maximum number of emails sent at once.
+    :type concurrency: int
+    :return: counts of sent, skipped and failed digests.
+    :rtype: dict
+    """
+
+    stats = {"sent": 0, "skipped": 0, "failed": 0}
+    slots = asyncio.Semaphore(concurrency)
+
+    async def deliver(digest: Digest):
+        try:
+            await send_birthday_digest(digest.email, digest.username, digest.contacts)
+            status = "sent"
+        except Exception as e:
+            print(e)
+            status = "failed"
+        finally:
+            slots.release()
+        stats[status] += 1
+        # An error here must not escape: it would cancel every other digest in the task group.
+        # The claim then stays pending and is retried once it is stale.
+        try:
+            async with AsyncSessionLocal() as db:
+                await repository_reminders.set_status(digest.user_id, day, status, db)
+        except Exception as e:
+            print(f"Could not record digest of user {digest.user_id} as {status}: {e}")
+
+    async with AsyncSessionLocal() as db, asyncio.TaskGroup() as tasks:
+        async for digest in repository_reminders.iter_digests(day, shard, shards):
+            if not await repository_reminders.claim(digest.user_id, day, settings.reminder_stale_after, db):
+                stats["skipped"] += 1
+                continue
+            await slots.acquire()
+            tasks.create_task(deliver(digest))
+    return stats
+
+
+def seconds_until(hour: int, now: datetime) -> float:
+    next_run = datetime.combine(now.date(), time(hour))
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+async def send_until_done(day: date, shard: int, shards: int, deadline: datetime,
+                          retry_delay: float = settings.reminder_retry_delay) -> int:
+
+    """
+    Runs ``send_daily_digests`` again until no digest of the day is left unsent.
+
+    Failed digests are picked up by the next run, pending ones left by a
+    crashed worker once they are ``settings.reminder_stale_after`` seconds
+    old, so the delay between runs doubles up to that.
+
+    :param day: the day.
+    :type day: date
+    :param shard: shard number, 0 based.
+    :type shard: int
+    :param shards: total number of shards.
+    :type shards: int
+    :param deadline: no run is started after this time.
+    :type deadline: datetime
+    :param retry_delay: seconds before the first re-run.
+    :type retry_delay: float
+    :return: number of digests still unsent at the deadline.
+    :rtype: int
+    """
+
+    while True:
+        print(datetime.now(), await send_daily_digests(day, shard, shards))
+        async with AsyncSessionLocal() as db:
+            unsent = await repository_reminders.count_unsent(day, shard, shards, db)
+        if not unsent or datetime.now() + timedelta(seconds=retry_delay) >= deadline:
+            return unsent
+        await asyncio.sleep(retry_delay)
+        retry_delay = min(retry_delay * 2, settings.reminder_stale_after)
+
+
+async def run_daily(shard: int, shards: int) -> None:
+
+    """
+    Runs the digest for today right away, to finish a run interrupted by a
+    crash, then every day at ``settings.reminder_hour``. Each day's run is
+    repeated until every digest is sent or the next day's run is due.
+    """
+
+    while True:
+        deadline = datetime.now() + timedelta(seconds=seconds_until(settings.reminder_hour, datetime.now()))
+        unsent = await send_until_done(date.today(), shard, shards, deadline)
+        if unsent:
+            print(f"{unsent} digests left unsent")
+        await asyncio.sleep(seconds_until(settings.reminder_hour, datetime.now()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily birthday digest")
+    parser.add_argument("--day", type=date.fromisoformat, help="send once for this day (YYYY-MM-DD) and exit")
+    parser.add_argument("--shard", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=1)
+    args = parser.parse_args()
+    if args.day:
+        print(asyncio.run(send_daily_digests(args.day, args.shard, args.shards)))
+    else:
+        asyncio.run(run_daily(args.shard, args.shards))
@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+import signal
+
+from src.conf.config import settings
+from src.services import metrics
+from src.services.cache import redis_client
+from src.services.email import mail_sender, send_email
+from src.services.queue import job_queue
+
+job_queue.register("send_email", send_email)
+
+
+async def main(concurrency: int) -> None:
+
+    """
+    Runs queued jobs until SIGINT or SIGTERM, then flushes pending emails.
+
+    :param concurrency: number of jobs run at once.
+    :type concurrency: int
+    """
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await job_queue.work(concurrency, stop)
+    finally:
+        await mail_sender.stop()
+        await redis_client.aclose()
+        metrics.mark_process_dead()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background job worker")
+    parser.add_argument("--concurrency", type=int, default=settings.queue_concurrency)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
@@ -0,0 +1,79 @@
+import unittest
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, select, insert
+
+from src.db.db import Base
+from src.db.models import Contact
+from src.repository.contacts import contact_lookup, _contacts_after, birthday_window, search_query
+
+
+class TestContactIndexes(unittest.TestCase):
+
+    """
+    Checks with EXPLAIN QUERY PLAN on SQLite that every per-user contact
+    query is served by an index instead of a table scan.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine("sqlite://")
+        Base.metadata.create_all(cls.engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+
+    def query_plan(self, stmt):
+        compiled = stmt.compile(dialect=self.engine.dialect)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, params).all()
+        return " | ".join(row[-1] for row in rows)
+
+    def assertUsesIndex(self, stmt, index):
+        plan = self.query_plan(stmt)
+        self.assertIn(index, plan)
+        self.assertNotRegex(plan, r"SCAN contacts(?! USING)")
+
+    def test_get_contact(self):
+        plan = self.query_plan(contact_lookup(1, id=1))
+        self.assertRegex(plan, r"SEARCH contacts USING (INTEGER PRIMARY KEY|INDEX ix_contacts_user_id_id)")
+
+    def test_get_contact_by_name(self):
+        self.assertUsesIndex(contact_lookup(1, name="Ivan"), "ix_contacts_user_id_name")
+
+    def test_get_contact_by_lastname(self):
+        self.assertUsesIndex(contact_lookup(1, lastname="Ivanoff"), "ix_contacts_user_id_lastname")
+
+    def test_get_contact_by_email(self):
+        self.assertUsesIndex(contact_lookup(1, email="ivanoff@example.com"), "sqlite_autoindex_contacts")
+
+    def test_get_contacts_page(self):
+        self.assertUsesIndex(_contacts_after(1, 0).limit(100), "ix_contacts_user_id_id")
+
+    def test_get_birthdays(self):
+        start_md, end_md = birthday_window(date(2025, 3, 11), 7)
+        stmt = select(Contact).filter(Contact.user_id == 1, Contact.birthday_md.between(start_md, end_md))
+        self.assertUsesIndex(stmt, "ix_contacts_user_id_birthday_md")
+
+    def test_search_contacts(self):
+        self.assertIn("VIRTUAL TABLE", self.query_plan(search_query(1, "ivanoff", "sqlite")))
+
+    def test_search_contacts_ranking(self):
+        rows = [dict(name=name, lastname=lastname, email=f"{name.lower()}@example.com", phone=phone,
+                     birthday=date(2000, 1, 1), additional="", contact_date=datetime.now(), user_id=user_id)
+                for name, lastname, phone, user_id in (("Ivan", "Ivanoff", "+380501", 1), ("Olga", "Kovalenko", "+380502", 1),
+                                                       ("Petro", "Petrenko", "+380503", 1), ("Olga", "Kovalenko", "+380504", 2))]
+        with self.engine.begin() as conn:
+            conn.execute(insert(Contact), rows)
+            typo = conn.execute(search_query(1, "Kovalenkp", "sqlite")).scalars().all()
+            prefix = conn.execute(search_query(1, "iv", "sqlite")).scalars().all()
+            conn.execute(Contact.__table__.delete())
+        self.assertEqual(typo[0], 2)
+        self.assertNotIn(4, typo)
+        self.assertEqual(prefix, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock
 
 from src.db.models import User
 
@@ -6,8 +6,8 @@ import pytest
 
 
 def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+    mock_enqueue = AsyncMock()
+    monkeypatch.setattr("src.routes.auth.job_queue.enqueue", mock_enqueue)
     response = client.post(
         "/api/auth/signup",
         json=user,
@@ -0,0 +1,50 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from src.services.avatars import AvatarPipeline, LocalStorage, resize
+
+
+def image_bytes(size=(1000, 600), fmt="PNG") -> bytes:
+    out = io.BytesIO()
+    Image.new("RGBA", size, (200, 10, 10, 128)).save(out, fmt)
+    return out.getvalue()
+
+
+class TestAvatars(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(self.dir.name, "/static/avatars/")
+        self.pipeline = AvatarPipeline(self.storage, size=250, max_bytes=1024 * 1024, workers=1)
+
+    def tearDown(self):
+        self.pipeline.shutdown()
+        self.dir.cleanup()
+
+    def test_resize_crops_to_square_jpeg(self):
+        path = Path(self.dir.name) / "in.png"
+        path.write_bytes(image_bytes())
+        with Image.open(io.BytesIO(resize(str(path), 250))) as image:
+            self.assertEqual((image.format, image.size, image.mode), ("JPEG", (250, 250), "RGB"))
+
+    async def test_upload_stores_resized_avatar(self):
+        url = await self.pipeline.upload(UploadFile(io.BytesIO(image_bytes())), "7")
+        self.assertTrue(url.startswith("/static/avatars/7.jpg?v="))
+        with Image.open(Path(self.dir.name) / "7.jpg") as image:
+            self.assertEqual(image.size, (250, 250))
+
+    async def test_upload_rejects_large_files(self):
+        with self.assertRaises(HTTPException) as e:
+            await self.pipeline.upload(UploadFile(io.BytesIO(b"\0" * (1024 * 1024 + 1))), "7")
+        self.assertEqual(e.exception.status_code, 413)
+        self.assertFalse((Path(self.dir.name) / "7.jpg").exists())
+
+    async def test_upload_rejects_non_images(self):
+        with self.assertRaises(HTTPException) as e:
+            await self.pipeline.upload(UploadFile(io.BytesIO(b"not an image")), "7")
+        self.assertEqual(e.exception.status_code, 400)
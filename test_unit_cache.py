@@ -0,0 +1,215 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+from datetime import datetime
+
+from fastapi import Request
+from jose import jwt, JWTError
+from redis.exceptions import ConnectionError
+
+from src.db.models import User
+from src.services.cache import UserCache, CachedUser, ClaimsCache, ContactsCache
+from src.services.auth import Auth
+
+try:
+    import lupa
+    from fakeredis import FakeAsyncRedis
+except ImportError:
+    FakeAsyncRedis = None
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.redis.get.return_value = None
+        self.clock = Clock()
+        self.cache = UserCache(self.redis, ttl=900, local_ttl=30, local_size=2, clock=self.clock)
+        self.user = User(id=1, username="ivanoff", email="ivanoff@example.com", password="hash",
+                         refresh_token="token", avatar="http://avatar", created_at=datetime(2024, 3, 11), confirmed=True)
+
+    def test_serialization_skips_secrets(self):
+        raw = CachedUser.from_user(self.user).dumps()
+        self.assertNotIn("hash", raw)
+        self.assertNotIn("token", raw)
+        self.assertEqual(CachedUser.loads(raw), CachedUser.from_user(self.user))
+
+    async def test_set_is_single_round_trip(self):
+        await self.cache.set(self.user)
+        self.redis.set.assert_awaited_once_with("user:v2:ivanoff@example.com", CachedUser.from_user(self.user).dumps(), ex=900)
+        self.redis.expire.assert_not_called()
+
+    async def test_local_hit_skips_redis(self):
+        await self.cache.set(self.user)
+        result = await self.cache.get(self.user.email)
+        self.assertEqual(result.id, 1)
+        self.redis.get.assert_not_awaited()
+        self.assertEqual(self.cache.stats()["local_hits"], 1)
+
+    async def test_redis_hit_after_local_expiry(self):
+        await self.cache.set(self.user)
+        self.redis.get.return_value = CachedUser.from_user(self.user).dumps().encode()
+        self.clock.now = 31
+        result = await self.cache.get(self.user.email)
+        self.assertEqual(result.email, self.user.email)
+        self.assertEqual(self.cache.stats()["redis_hits"], 1)
+
+    async def test_miss(self):
+        self.assertIsNone(await self.cache.get("nobody@example.com"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    async def test_local_tier_is_bounded(self):
+        for n in range(3):
+            await self.cache.set(User(id=n, username="u", email=f"u{n}@example.com", confirmed=True))
+        self.assertEqual(self.cache.stats()["local_size"], 2)
+        self.assertIsNone(await self.cache.get("u0@example.com"))
+
+    async def test_invalidate(self):
+        await self.cache.set(self.user)
+        await self.cache.invalidate(self.user.email)
+        self.redis.delete.assert_awaited_once_with("user:v2:ivanoff@example.com")
+        self.redis.publish.assert_awaited_once_with(UserCache.channel, self.user.email)
+        self.assertIsNone(await self.cache.get(self.user.email))
+
+    async def test_redis_errors_fall_back_to_local_tier(self):
+        self.redis.get.side_effect = self.redis.set.side_effect = ConnectionError("down")
+        self.redis.delete.side_effect = ConnectionError("down")
+        self.assertIsNone(await self.cache.get(self.user.email))
+        cached = await self.cache.set(self.user)
+        self.assertEqual(await self.cache.get(self.user.email), cached)
+        await self.cache.invalidate(self.user.email)
+        self.assertIsNone(await self.cache.get(self.user.email))
+        self.assertEqual(self.cache.stats()["errors"], 4)
+
+
+class TestClaimsCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = ClaimsCache(size=2, clock=self.clock)
+
+    def test_hit_until_exp(self):
+        self.cache.set("token", {"sub": "ivanoff@example.com", "exp": 100})
+        self.assertEqual(self.cache.get("token")["sub"], "ivanoff@example.com")
+        self.clock.now = 100
+        self.assertIsNone(self.cache.get("token"))
+
+    def test_without_exp_not_cached(self):
+        self.cache.set("token", {"sub": "ivanoff@example.com"})
+        self.assertIsNone(self.cache.get("token"))
+
+    def test_bounded(self):
+        for n in range(3):
+            self.cache.set(f"token{n}", {"exp": 100})
+        self.assertIsNone(self.cache.get("token0"))
+        self.assertEqual(self.cache.stats()["size"], 2)
+
+    async def test_auth_decodes_token_once(self):
+        auth = Auth()
+        auth.SECRET_KEY, auth.ALGORITHM = "secret", "HS256"
+        auth.claims_cache = ClaimsCache()
+        token = await auth.create_access_token(data={"sub": "ivanoff@example.com"})
+        with patch("src.services.auth.jwt.decode", wraps=jwt.decode) as decode:
+            auth.decode_token(token)
+            claims = auth.decode_token(token)
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(claims["scope"], "access_token")
+        self.assertEqual(await auth.decode_refresh_token(await auth.create_refresh_token(data={"sub": "x@x"})), "x@x")
+
+    def test_auth_invalid_token_not_cached(self):
+        auth = Auth()
+        auth.SECRET_KEY, auth.ALGORITHM = "secret", "HS256"
+        auth.claims_cache = ClaimsCache()
+        with self.assertRaises(JWTError):
+            auth.decode_token("not-a-token")
+        self.assertEqual(auth.claims_cache.stats()["size"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+@unittest.skipIf(FakeAsyncRedis is None, "fakeredis with lupa is not installed")
+class TestContactsCache(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = FakeAsyncRedis()
+        self.cache = ContactsCache(self.redis, ttl=60)
+        self.builds = 0
+
+    async def asyncTearDown(self):
+        await self.redis.flushall()
+        await self.redis.aclose()
+
+    async def build(self):
+        self.builds += 1
+        return b'[{"id": 1}]', {"X-Next-After-Id": "1"}
+
+    def request(self, etag: str | None = None) -> Request:
+        headers = [(b"if-none-match", etag.encode())] if etag else []
+        return Request({"type": "http", "headers": headers})
+
+    async def test_body_is_built_once_per_version(self):
+        first = await self.cache.respond(self.request(), 1, "contacts?limit=1", self.build)
+        second = await self.cache.respond(self.request(), 1, "contacts?limit=1", self.build)
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(second.body, b'[{"id": 1}]')
+        self.assertEqual(second.headers["X-Next-After-Id"], "1")
+        self.assertEqual(first.headers["ETag"], second.headers["ETag"])
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 1))
+
+    async def test_matching_etag_gets_304(self):
+        first = await self.cache.respond(self.request(), 1, "contacts?limit=1", self.build)
+        etag = first.headers["ETag"]
+        response = await self.cache.respond(self.request(f'W/"other", {etag}'), 1, "contacts?limit=1", self.build)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.builds, 1)
+
+    async def test_etag_of_another_view_does_not_match(self):
+        first = await self.cache.respond(self.request(), 1, "contacts?limit=1", self.build)
+        response = await self.cache.respond(self.request(first.headers["ETag"]), 1, "contacts?limit=2", self.build)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.builds, 2)
+
+    async def test_bump_invalidates_only_that_user(self):
+        first = await self.cache.respond(self.request(), 1, "contacts?limit=1", self.build)
+        await self.cache.respond(self.request(), 2, "contacts?limit=1", self.build)
+        await self.cache.bump(1)
+        response = await self.cache.respond(self.request(first.headers["ETag"]), 1, "contacts?limit=1", self.build)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], first.headers["ETag"])
+        await self.cache.respond(self.request(), 2, "contacts?limit=1", self.build)
+        self.assertEqual(self.builds, 3)
+
+    async def test_lost_version_restarts_above_old_versions(self):
+        await self.cache.bump(1)
+        old = int(await self.redis.get("contacts:1:version"))
+        await self.redis.delete("contacts:1:version")
+        await self.cache.bump(1)
+        self.assertGreater(int(await self.redis.get("contacts:1:version")), old)
+
+    async def test_bump_marks_user_recently_written_for_replica_lag(self):
+        self.assertFalse(await self.cache.recently_written(1))
+        await self.cache.bump(1)
+        self.assertFalse(await self.cache.recently_written(1))
+        self.cache.replica_lag = 5
+        await self.cache.bump(1)
+        self.assertTrue(await self.cache.recently_written(1))
+        self.assertFalse(await self.cache.recently_written(2))
+        self.assertLessEqual(await self.redis.ttl("contacts:1:written"), 5)
+
+    async def test_redis_errors_build_uncached(self):
+        self.cache._lookup = AsyncMock(side_effect=ConnectionError("down"))
+        response = await self.cache.respond(self.request(), 1, "contacts?limit=1", self.build)
+        self.assertEqual(response.body, b'[{"id": 1}]')
+        self.assertNotIn("ETag", response.headers)
+        self.assertEqual(self.cache.errors, 1)
@@ -0,0 +1,91 @@
+import unittest
+from datetime import date, datetime
+
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.db.db import Base
+from src.db.models import Contact, User
+from src.repository.contacts import (get_contacts_by_ids, remove_contact, remove_contacts, update_contact,
+                                     update_contacts)
+
+
+class TestContactWrites(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User), [{"id": 1, "username": "ivanoff", "email": "ivanoff@example.com", "password": "x"},
+                                              {"id": 2, "username": "petroff", "email": "petroff@example.com", "password": "x"}])
+            await conn.execute(insert(Contact), [
+                {"id": 1, "name": "Ivan", "lastname": "Ivanoff", "email": "ivan@example.com", "phone": "+380500000001",
+                 "birthday": date(1990, 3, 11), "birthday_md": 311, "additional": "", "contact_date": datetime(2024, 1, 1),
+                 "user_id": 1},
+                {"id": 2, "name": "Petro", "lastname": "Petroff", "email": "petro@example.com", "phone": "+380500000002",
+                 "birthday": date(1991, 5, 1), "birthday_md": 501, "additional": "", "contact_date": datetime(2024, 1, 1),
+                 "user_id": 1},
+            ])
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.statements = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.split()[0])
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def test_update_changes_only_given_fields_in_one_statement(self):
+        contact = await update_contact(1, 1, {"phone": "+380509999999", "birthday": date(1990, 12, 31)}, self.session)
+        self.assertEqual(self.statements, ["UPDATE"])
+        self.assertEqual(contact.phone, "+380509999999")
+        self.assertEqual(contact.email, "ivan@example.com")
+        self.assertEqual(contact.birthday_md, 1231)
+        self.assertGreater(contact.contact_date, datetime(2024, 1, 1))
+        self.assertEqual(contact.search_text, "ivan ivanoff ivan@example.com +380509999999")
+
+    async def test_update_of_another_users_contact_returns_none(self):
+        self.assertIsNone(await update_contact(2, 1, {"phone": "+380509999999"}, self.session))
+
+    async def test_update_to_taken_email_raises(self):
+        with self.assertRaises(IntegrityError):
+            await update_contact(1, 1, {"email": "petro@example.com"}, self.session)
+
+    async def test_remove_returns_deleted_contact(self):
+        contact = await remove_contact(1, 2, self.session)
+        self.assertEqual(self.statements, ["DELETE"])
+        self.assertEqual(contact.name, "Petro")
+        self.assertIsNone(await remove_contact(1, 2, self.session))
+        self.assertIsNone(await remove_contact(2, 1, self.session))
+        self.assertEqual(await self.session.scalar(select(func.count()).select_from(Contact)), 1)
+
+    async def test_batch_get_skips_other_users_contacts(self):
+        contacts = await get_contacts_by_ids(1, [1, 2, 3], self.session)
+        self.assertEqual(sorted(contact.id for contact in contacts), [1, 2])
+        self.assertEqual(await get_contacts_by_ids(2, [1, 2], self.session), [])
+
+    async def test_batch_update_applies_each_items_fields_in_one_statement(self):
+        contacts = await update_contacts(1, [{"id": 1, "phone": "+380509999999"},
+                                             {"id": 2, "name": "Pavlo", "birthday": date(1991, 12, 31)},
+                                             {"id": 3, "name": "Nobody"}], self.session)
+        self.assertEqual(self.statements, ["WITH"])
+        contacts = {contact.id: contact for contact in contacts}
+        self.assertEqual(sorted(contacts), [1, 2])
+        self.assertEqual((contacts[1].name, contacts[1].phone, contacts[1].birthday_md), ("Ivan", "+380509999999", 311))
+        self.assertEqual((contacts[2].name, contacts[2].phone, contacts[2].birthday_md), ("Pavlo", "+380500000002", 1231))
+
+    async def test_batch_update_of_another_user_changes_nothing(self):
+        self.assertEqual(await update_contacts(2, [{"id": 1, "name": "Nobody"}], self.session), [])
+        self.assertEqual(await self.session.scalar(select(Contact.name).filter(Contact.id == 1)), "Ivan")
+
+    async def test_batch_update_conflict_raises(self):
+        with self.assertRaises(IntegrityError):
+            await update_contacts(1, [{"id": 1, "email": "petro@example.com"}], self.session)
+
+    async def test_batch_remove_returns_deleted_ids(self):
+        self.assertEqual(await remove_contacts(2, [1, 2], self.session), [])
+        self.assertEqual(sorted(await remove_contacts(1, [1, 2, 3], self.session)), [1, 2])
+        self.assertEqual(self.statements, ["DELETE", "DELETE"])
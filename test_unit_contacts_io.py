@@ -0,0 +1,70 @@
+import gzip
+import unittest
+from datetime import date, datetime
+
+from src.db.models import Contact
+from src.services.contacts_io import iter_lines, parse_csv, parse_ndjson, to_csv, vcard, gzip_stream
+
+
+async def chunked(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+async def batches(*batches):
+    for batch in batches:
+        yield batch
+
+
+class TestContactsIO(unittest.IsolatedAsyncioTestCase):
+
+    async def test_iter_lines_across_chunks(self):
+        body = "﻿name\r\nІван\nPetro".encode()
+        lines = await collect(iter_lines(chunked(body, 3)))
+        self.assertEqual(lines, ["name", "Іван", "Petro"])
+
+    async def test_parse_csv(self):
+        body = b'name,lastname\nIvan,Ivanoff\n\nbad\n"Li, Mei",Meier\n'
+        rows = await collect(parse_csv(iter_lines(chunked(body, 4))))
+        self.assertEqual(rows, [
+            (1, {"name": "Ivan", "lastname": "Ivanoff"}, None),
+            (2, None, "expected 2 fields, got 1"),
+            (3, {"name": "Li, Mei", "lastname": "Meier"}, None),
+        ])
+
+    async def test_parse_ndjson(self):
+        body = b'{"name": "Ivan"}\n[1]\n{oops\n'
+        rows = await collect(parse_ndjson(iter_lines(chunked(body, 5))))
+        self.assertEqual(rows[0], (1, {"name": "Ivan"}, None))
+        self.assertEqual(rows[1], (2, None, "expected a JSON object"))
+        self.assertTrue(rows[2][2].startswith("invalid JSON"))
+
+    async def test_to_csv_sends_header_first(self):
+        contact = Contact(id=1, name="Ivan", lastname="Ivanoff", email="i@x.com", phone="+123456", birthday=date(2000, 1, 2),
+                          additional="a,b", contact_date=datetime(2024, 3, 11))
+        chunks = await collect(to_csv(batches([contact])))
+        self.assertEqual(chunks[0], "id,name,lastname,email,phone,birthday,additional,contact_date\r\n")
+        self.assertEqual(chunks[1], '1,Ivan,Ivanoff,i@x.com,+123456,2000-01-02,"a,b",2024-03-11 00:00:00\r\n')
+
+    def test_vcard_escapes(self):
+        contact = Contact(name="Li;Mei", lastname="Meier", email="m@x.com", phone="+123456", birthday=date(2000, 1, 2),
+                          additional="line1\nline2, end")
+        card = vcard(contact)
+        self.assertIn("N:Meier;Li\\;Mei;;;\r\n", card)
+        self.assertIn("NOTE:line1\\nline2\\, end\r\n", card)
+        self.assertTrue(card.startswith("BEGIN:VCARD\r\n") and card.endswith("END:VCARD\r\n"))
+
+    async def test_gzip_stream(self):
+        async def chunks():
+            yield "first\n"
+            yield "second\n"
+        data = b"".join(await collect(gzip_stream(chunks())))
+        self.assertEqual(gzip.decompress(data), b"first\nsecond\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
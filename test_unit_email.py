@@ -0,0 +1,81 @@
+import asyncio
+import socket
+import unittest
+
+from src.services.email import MailSender
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+class Inbox:
+
+    def __init__(self, fail_first: int = 0):
+        self.messages = []
+        self.peers = []
+        self.fail_first = fail_first
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail_first:
+            self.fail_first -= 1
+            return "421 Service not available"
+        self.messages.append(envelope)
+        self.peers.append(session.peer)
+        return "250 OK"
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestMailSender(unittest.IsolatedAsyncioTestCase):
+
+    def start_server(self, inbox: Inbox, pool_size: int = 2) -> MailSender:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        controller = Controller(inbox, hostname="127.0.0.1", port=port)
+        controller.start()
+        self.addCleanup(controller.stop)
+        return MailSender(hostname="127.0.0.1", port=port, username=None,
+                          password=None, from_address="noreply@example.com", from_name="Birthday", use_tls=False,
+                          pool_size=pool_size, batch_size=10, retries=2, backoff=0)
+
+    async def test_send_over_pooled_connections(self):
+        inbox = Inbox()
+        sender = self.start_server(inbox)
+        await asyncio.gather(*(sender.send(f"user{n}@example.com", "Confirm your email", "email_template.html",
+                                           {"host": "http://localhost/", "username": f"user{n}", "token": "token"})
+                               for n in range(20)))
+        await sender.stop()
+        self.assertEqual(len(inbox.messages), 20)
+        message = next(m for m in inbox.messages if m.rcpt_tos == ["user7@example.com"])
+        self.assertIn(b"Hi user7", message.content)
+        self.assertEqual(sender.stats()["sent"], 20)
+
+    async def test_burst_is_spread_over_the_pool(self):
+        inbox = Inbox()
+        sender = self.start_server(inbox, pool_size=4)
+        await asyncio.gather(*(sender.send(f"user{n}@example.com", "Confirm your email", "email_template.html",
+                                           {"host": "http://localhost/", "username": f"user{n}", "token": "token"})
+                               for n in range(8)))
+        await sender.stop()
+        self.assertEqual(len(inbox.messages), 8)
+        self.assertGreater(len(set(inbox.peers)), 1)
+
+    async def test_retries_with_backoff(self):
+        inbox = Inbox(fail_first=1)
+        sender = self.start_server(inbox)
+        await sender.send("user@example.com", "Birthdays today", "birthday_digest.html",
+                          {"username": "user", "contacts": [{"name": "Ivan", "lastname": "Ivanoff", "email": "i@x.com", "phone": "+1"}]})
+        await sender.stop()
+        self.assertEqual(len(inbox.messages), 1)
+        self.assertEqual(sender.stats()["retried"], 1)
+
+    def test_template_escapes(self):
+        sender = MailSender("localhost", 25, None, None, "noreply@example.com", "Birthday")
+        html = sender.render("birthday_digest.html", {"username": "<b>", "contacts": []})
+        self.assertIn("&lt;b&gt;", html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,11 @@
+import json
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock, patch
 
-from libgravatar import Gravatar
-from sqlalchemy.sql import extract, expression, or_
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta, date
-from src.schemas import ContactModel, ContactResponse, UpdateModel, UserModel
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, date
+from src.schemas import ContactModel, ContactResponse, UpdateModel, UserModel, BatchIds, BatchUpdate
 
 from src.db.models import Contact, User
 from src.schemas import UserDb, UserResponse, TokenModel, RequestEmail
@@ -19,78 +19,115 @@ from main import (
     create_contact,
     remove_contact,
     update_contact,
+    get_contacts_batch,
+    update_contacts_batch,
+    remove_contacts_batch,
 )
 
 from src.repository.users import (
     get_user_by_email,
 )
+from src.repository.contacts import birthday_window
 
 
 
+async def respond_uncached(request, user_id, view, build):
+    body, headers = await build()
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def make_contact(id: int) -> Contact:
+    return Contact(id=id, name="Ivan", lastname="Ivanoff", email=f"ivan{id}@example.com", phone=f"+38050{id:07d}",
+                   birthday=date(1990, 3, 11), additional="", contact_date=datetime(2024, 3, 11))
+
+
 class TestQuotes(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.user = User(id=1)
+        self.request = Request({"type": "http", "headers": []})
+        cache = patch("main.contacts_cache")
+        self.contacts_cache = cache.start()
+        self.addCleanup(cache.stop)
+        self.contacts_cache.respond = respond_uncached
+        self.contacts_cache.bump = AsyncMock()
 
     async def test_get_user_by_email(self):
-        user_auth = self.session.query(User).filter(User.email == self.user.email).first()
-        result = await get_user_by_email(email=self.user.email, db=self.session)
+        user_auth = User(id=1, email="ivanoff@example.com")
+        self.result.scalar_one_or_none.return_value = user_auth
+        result = await get_user_by_email(email=user_auth.email, db=self.session)
         self.assertEqual(result, user_auth)
 
 
     async def test_get_contacts(self):
-        contacts = self.session.query(Contact).filter(Contact.user_id == self.user.id)
-        result = await get_contacts(current_user=self.user, db=self.session)
-        self.assertEqual(result, contacts)
+        contacts = [make_contact(1), make_contact(2)]
+        self.result.scalars().all.return_value = contacts
+        result = await get_contacts(request=self.request, limit=100, after_id=0, stream=False, current_user=self.user, db=self.session)
+        self.assertEqual([contact["id"] for contact in json.loads(result.body)], [1, 2])
+        self.assertNotIn("X-Next-After-Id", result.headers)
+
+
+    async def test_get_contacts_next_page(self):
+        contacts = [make_contact(3), make_contact(7)]
+        self.result.scalars().all.return_value = contacts
+        result = await get_contacts(request=self.request, limit=2, after_id=0, stream=False, current_user=self.user, db=self.session)
+        self.assertEqual([contact["id"] for contact in json.loads(result.body)], [3, 7])
+        self.assertEqual(result.headers["X-Next-After-Id"], "7")
 
 
     async def test_get_contact(self):
         contact = Contact()
-        self.session.query().filter_by(id=1, user_id=1).first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await get_contact(contact_id=1, current_user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
 
     async def test_get_contact_by_name(self):
         contact = Contact()
-        self.session.query().filter_by(name="Ivan", user_id=1).first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await get_contact_by_name(nm="Ivan", current_user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
 
     async def test_get_contact_by_lastname(self):
         contact = Contact()
-        self.session.query().filter_by(lastname="Ivanoff", user_id=1).first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await get_contact_by_lastname(l_name="Ivanoff", current_user=self.user, db=self.session)
         self.assertEqual(result, contact)
     
 
     async def test_get_contact_by_email(self):
         contact = Contact()
-        self.session.query().filter_by(email="ivanoff@example.com", user_id=1).first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await get_contact_by_emal(eml="ivanoff@example.com", current_user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
 
     async def test_get_birthdays(self):
+        contacts = [make_contact(1)]
+        self.result.scalars().all.return_value = contacts
+        result = await get_birthdays(request=self.request, days=7, current_user=self.user, db=self.session)
+        self.assertEqual(json.loads(result.body)[0]["email"], "ivan1@example.com")
 
-        today_doy = datetime.today().timetuple().tm_yday 
-        days_per_year, leap_delta = (366, 1) if datetime.now().year%4 == 0 and datetime.now().year%400 == 0 else (365, 0)
-        start_doy = today_doy + leap_delta
-        next_doy = today_doy + 7
 
-        if next_doy > days_per_year :
-            start_doy = leap_delta
-            next_doy -= days_per_year
+    def test_birthday_window(self):
+        self.assertEqual(birthday_window(date(2025, 3, 11), 7), (311, 317))
 
 
-        contacts = self.session.query(Contact).filter(or_(
-        expression.between(extract('doy', Contact.birthday), start_doy, next_doy-1),
-        expression.between(extract('doy', Contact.birthday), today_doy, today_doy+6),
-        )).all()
-        result = await get_birthdays(current_user=self.user, db=self.session)
-        self.assertEqual(result, contacts)
+    def test_birthday_window_new_year(self):
+        self.assertEqual(birthday_window(date(2025, 12, 28), 7), (1228, 103))
+
+
+    def test_birthday_window_leap_day(self):
+        self.assertEqual(birthday_window(date(2025, 2, 22), 7), (222, 229))
+        self.assertEqual(birthday_window(date(2024, 2, 22), 7), (222, 228))
+
+
+    def test_birthday_window_whole_year(self):
+        self.assertEqual(birthday_window(date(2025, 3, 11), 366), (101, 1231))
 
 
     async def test_create_contact(self):
@@ -105,23 +142,58 @@ class TestQuotes(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.phone, body.phone)
         self.assertEqual(result.birthday, body.birthday)
         self.assertEqual(result.additional, body.additional)
+        self.contacts_cache.bump.assert_awaited_once_with(1)
 
 
     async def test_remove_contact(self):
         contact = Contact()
-        self.session.query().filter_by(id=1, user_id = 1).first.return_value = contact
+        self.session.scalar.return_value = contact
         result = await remove_contact(cont_id=1, current_user=self.user, db=self.session)
         self.assertEqual(result, contact)
+        self.session.scalar.assert_awaited_once()
+        self.session.execute.assert_not_awaited()
+        self.contacts_cache.bump.assert_awaited_once_with(1)
+
+    async def test_remove_missing_contact(self):
+        self.session.scalar.return_value = None
+        with self.assertRaises(HTTPException) as e:
+            await remove_contact(cont_id=1, current_user=self.user, db=self.session)
+        self.assertEqual(e.exception.status_code, 404)
+        self.contacts_cache.bump.assert_not_awaited()
 
 
     async def test_update_contact(self):
-        body = UpdateModel(email="test@test.com", phone="+123456789", additional="no")
-        contact = Contact (email = body.email, phone = body.phone, additional = body.additional, user = self.user)
-        contact.contact_date = datetime.now()
-        result = await update_contact(body=body, current_user=self.user, db=self.session)
-        self.assertEqual(result.email, body.email)
-        self.assertEqual(result.phone, body.phone)
-        self.assertEqual(result.additional, body.additional)
+        body = UpdateModel(phone="+123456789")
+        contact = make_contact(1)
+        contact.phone = body.phone
+        self.session.scalar.return_value = contact
+        result = await update_contact(body=body, cont_id=1, current_user=self.user, db=self.session)
+        self.assertEqual(result, contact)
+        stmt = self.session.scalar.await_args.args[0]
+        self.assertEqual({column.key for column in stmt._values}, {"phone", "contact_date"})
+        self.session.execute.assert_not_awaited()
+        self.contacts_cache.bump.assert_awaited_once_with(1)
+
+    async def test_get_contacts_batch_keeps_request_order(self):
+        self.result.scalars().all.return_value = [make_contact(3), make_contact(1)]
+        result = await get_contacts_batch(body=BatchIds(ids=[1, 2, 3]), current_user=self.user, db=self.session)
+        self.assertEqual([(r["id"], r["status"]) for r in result["results"]], [(1, 200), (2, 404), (3, 200)])
+        self.assertEqual(result["results"][2]["contact"].id, 3)
+        self.session.execute.assert_awaited_once()
+
+    async def test_update_contacts_batch(self):
+        self.result.scalars().all.return_value = [make_contact(2)]
+        body = BatchUpdate(items=[{"id": 1, "phone": "+123456789"}, {"id": 2, "additional": "no"}])
+        result = await update_contacts_batch(body=body, current_user=self.user, db=self.session)
+        self.assertEqual([(r["id"], r["status"]) for r in result["results"]], [(1, 404), (2, 200)])
+        self.session.execute.assert_awaited_once()
+        self.contacts_cache.bump.assert_awaited_once_with(1)
+
+    async def test_remove_contacts_batch_without_matches_keeps_cache(self):
+        self.result.scalars().all.return_value = []
+        result = await remove_contacts_batch(body=BatchIds(ids=[5]), current_user=self.user, db=self.session)
+        self.assertEqual(result["results"], [{"id": 5, "status": 404}])
+        self.contacts_cache.bump.assert_not_awaited()
 
 
 """
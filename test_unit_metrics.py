@@ -0,0 +1,58 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from src.services import metrics
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        app.add_middleware(metrics.MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        def get_item(item_id: int):
+            return {"id": item_id}
+
+        self.client = TestClient(app)
+
+    def test_requests_are_labelled_by_route_template(self):
+        before = sample("http_request_duration_seconds_count", method="GET", route="/items/{item_id}", status="200")
+        self.client.get("/items/1")
+        self.client.get("/items/2")
+        after = sample("http_request_duration_seconds_count", method="GET", route="/items/{item_id}", status="200")
+        self.assertEqual(after - before, 2)
+        self.assertEqual(sample("http_requests_in_progress", method="GET"), 0)
+
+    def test_unmatched_requests_share_one_label(self):
+        before = sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404")
+        self.client.get("/missing/1")
+        self.client.get("/missing/2")
+        after = sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404")
+        self.assertEqual(after - before, 2)
+
+    def test_query_time_by_operation(self):
+        engine = create_engine("sqlite://")
+        metrics.instrument_engine(engine)
+        before = sample("db_query_duration_seconds_count", operation="SELECT")
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            with self.assertRaises(Exception):
+                conn.execute(text("SELECT * FROM missing"))
+            self.assertEqual(conn.info["query_started"], [])
+        self.assertEqual(sample("db_query_duration_seconds_count", operation="SELECT") - before, 1)
+        engine.dispose()
+
+    def test_render(self):
+        metrics.CACHE_REQUESTS.labels("user", "miss").inc()
+        body, content_type = metrics.render()
+        self.assertTrue(content_type.startswith("text/plain"))
+        self.assertIn(b'cache_requests_total{cache="user",result="miss"}', body)
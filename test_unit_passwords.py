@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from src.services.passwords import PasswordPool
+
+fast_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4)
+
+
+@patch("src.services.passwords.pwd_context", fast_context)
+class TestPasswordPool(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.pool = PasswordPool(workers=2, max_queue=1)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.pool.hash("secret")
+        self.assertEqual(await self.pool.verify_and_update("secret", hashed), (True, None))
+        self.assertEqual(await self.pool.verify_and_update("wrong", hashed), (False, None))
+        self.assertEqual(self.pool.stats()["completed"], 3)
+
+    async def test_rehash_on_cost_change(self):
+        old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash("secret")
+        verified, new_hash = await self.pool.verify_and_update("secret", old_hash)
+        self.assertTrue(verified)
+        self.assertTrue(new_hash.startswith("$2b$04$"))
+
+    async def test_rejects_when_queue_full(self):
+        results = await asyncio.gather(*(self.pool.hash("secret") for _ in range(4)), return_exceptions=True)
+        rejected = [r for r in results if isinstance(r, HTTPException)]
+        self.assertEqual(len(rejected), 1)
+        self.assertEqual(rejected[0].status_code, 503)
+        self.assertEqual(self.pool.stats()["rejected"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
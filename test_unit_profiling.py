@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+from datetime import date, datetime
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db.db import Base
+from src.db.models import Contact, User
+from src.services import profiling
+
+
+class TestSQLProfiling(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        profiling.install(cls.engine.sync_engine)
+        cls.Session = async_sessionmaker(cls.engine, expire_on_commit=False)
+
+        async def get_db():
+            async with cls.Session() as db:
+                yield db
+
+        app = FastAPI()
+        app.add_middleware(profiling.SQLProfilingMiddleware, threshold=3)
+
+        @app.post("/seed")
+        async def seed(db=Depends(get_db)):
+            async with cls.engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            for n in range(4):
+                user = User(username=f"user{n}", email=f"user{n}@example.com", password="x")
+                db.add(Contact(name="Ivan", lastname="Ivanoff", email=f"ivan{n}@example.com", phone=f"+3805000000{n}",
+                               birthday=date(1990, 3, 11), additional="", contact_date=datetime.now(), user=user))
+            await db.commit()
+
+        @app.get("/owners")
+        async def owners(db=Depends(get_db)):
+            return await db.run_sync(lambda session: [c.user.email for c in session.scalars(select(Contact)).all()])
+
+        @app.get("/contacts")
+        async def contacts(db=Depends(get_db)):
+            return len((await db.scalars(select(Contact))).all())
+
+        cls.client = TestClient(app)
+        cls.client.post("/seed")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+
+    def test_server_timing_counts_queries(self):
+        response = self.client.get("/contacts")
+        self.assertRegex(response.headers["Server-Timing"], r'^db;dur=[\d.]+;desc="1 queries"$')
+
+    def test_lazy_loads_are_flagged(self):
+        with patch("builtins.print") as printed:
+            response = self.client.get("/owners")
+        self.assertEqual(len(response.json()), 4)
+        timing = response.headers["Server-Timing"]
+        self.assertIn('desc="5 queries"', timing)
+        self.assertIn('lazy;desc="4 lazy loads"', timing)
+        self.assertIn("n-plus-one", timing)
+        message = printed.call_args.args[0]
+        self.assertIn("Possible N+1 in GET /owners", message)
+        self.assertIn("Contact -> User x4", message)
+
+    def test_slow_queries_are_logged_with_parameter_types(self):
+        with patch.object(profiling.settings, "sql_slow_query_ms", 0), patch("builtins.print") as printed:
+            self.client.get("/contacts")
+        message = printed.call_args_list[0].args[0]
+        self.assertRegex(message, r"^Slow query [\d.]+ ms: SELECT contacts.id")
+        self.assertTrue(message.endswith("params ()"))
+
+    def test_queries_outside_requests_are_not_recorded(self):
+        self.assertIsNone(profiling.current_profile.get())
+
+    def test_parameter_shape(self):
+        self.assertEqual(profiling.parameter_shape((1, "Ivan"), False), "(int, str)")
+        self.assertEqual(profiling.parameter_shape({"user_id": 1}, False), "{user_id: int}")
+        self.assertEqual(profiling.parameter_shape([(1, "a"), (2, "b")], True), "2 x (int, str)")
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import time
+import unittest
+
+from redis.exceptions import ConnectionError
+
+from src.services.queue import JobQueue
+
+try:
+    from fakeredis import FakeAsyncRedis
+except ImportError:
+    FakeAsyncRedis = None
+
+
+@unittest.skipIf(FakeAsyncRedis is None, "fakeredis is not installed")
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = FakeAsyncRedis()
+        self.queue = JobQueue(self.redis, "test", max_retries=2, backoff=0.01, heartbeat_ttl=30)
+        self.calls = []
+
+        async def record(*args, **kwargs):
+            self.calls.append((args, kwargs))
+
+        self.queue.register("record", record)
+
+    async def asyncTearDown(self):
+        await self.redis.flushall()
+        await self.redis.aclose()
+
+    async def run_worker(self, until, concurrency: int = 2, timeout: float = 5):
+        stop = asyncio.Event()
+        worker = asyncio.create_task(self.queue.work(concurrency, stop))
+        deadline = time.monotonic() + timeout
+        try:
+            while not await until() and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+        finally:
+            stop.set()
+            await worker
+
+    async def test_enqueued_jobs_run_in_order(self):
+        for i in range(3):
+            await self.queue.enqueue("record", i, host="http://test/")
+
+        async def done():
+            return len(self.calls) == 3
+
+        await self.run_worker(done, concurrency=1)
+        self.assertEqual(self.calls, [((i,), {"host": "http://test/"}) for i in range(3)])
+        stats = await self.queue.stats()
+        self.assertEqual(stats["ready"], 0)
+        self.assertEqual(stats["succeeded"], 3)
+
+    async def test_failing_job_is_retried_then_dead_lettered(self):
+        attempts = []
+
+        async def broken():
+            attempts.append(1)
+            raise RuntimeError("smtp down")
+
+        self.queue.register("broken", broken)
+        await self.queue.enqueue("broken")
+
+        async def dead():
+            return await self.redis.llen(self.queue.dead) == 1
+
+        await self.run_worker(dead)
+        self.assertEqual(len(attempts), 3)
+        job = json.loads(await self.redis.lindex(self.queue.dead, 0))
+        self.assertEqual(job["attempts"], 3)
+        self.assertIn("smtp down", job["error"])
+        stats = await self.queue.stats()
+        self.assertEqual((stats["retried"], stats["dead"], stats["delayed"]), (2, 1, 0))
+
+    async def test_promote_delayed_moves_only_due_jobs(self):
+        await self.redis.zadd(self.queue.delayed, {"due": 10, "later": 100})
+        self.assertEqual(await self.queue.promote_delayed(now=50), 1)
+        self.assertEqual(await self.redis.lrange(self.queue.ready, 0, -1), [b"due"])
+        self.assertEqual(await self.redis.zcard(self.queue.delayed), 1)
+
+    async def test_promote_delayed_respects_limit(self):
+        await self.redis.zadd(self.queue.delayed, {"a": 1, "b": 2, "c": 3})
+        self.assertEqual(await self.queue.promote_delayed(now=50, limit=2), 2)
+        self.assertEqual(await self.redis.lrange(self.queue.ready, 0, -1), [b"b", b"a"])
+        self.assertEqual(await self.redis.zrange(self.queue.delayed, 0, -1), [b"c"])
+
+    @staticmethod
+    def job(id: str, attempts: int = 0) -> str:
+        return json.dumps({"id": id, "task": "record", "args": [], "kwargs": {}, "attempts": attempts,
+                           "enqueued_at": time.time()})
+
+    async def test_reap_requeues_jobs_of_dead_workers(self):
+        await self.redis.lpush("test:processing:alive", self.job("a"))
+        await self.redis.set("test:worker:alive", 1)
+        await self.redis.lpush("test:processing:gone", self.job("b"), self.job("c"))
+        self.assertEqual(await self.queue.reap(), 2)
+        jobs = [json.loads(raw) for raw in await self.redis.lrange(self.queue.ready, 0, -1)]
+        self.assertEqual(sorted(job["id"] for job in jobs), ["b", "c"])
+        self.assertEqual([job["attempts"] for job in jobs], [1, 1])
+        self.assertEqual(await self.redis.llen("test:processing:alive"), 1)
+        self.assertEqual(await self.redis.exists("test:processing:gone"), 0)
+
+    async def test_reap_dead_letters_jobs_that_keep_killing_workers(self):
+        await self.redis.lpush("test:processing:gone", self.job("poison", attempts=2))
+        self.assertEqual(await self.queue.reap(), 1)
+        self.assertEqual(await self.redis.llen(self.queue.ready), 0)
+        job = json.loads(await self.redis.lindex(self.queue.dead, 0))
+        self.assertEqual((job["id"], job["attempts"]), ("poison", 3))
+        self.assertIn("worker gone stopped", job["error"])
+        self.assertEqual((await self.queue.stats())["dead"], 1)
+
+    async def test_worker_survives_redis_errors(self):
+        self.queue.retry_delay = 0.01
+        blmove, set_ = self.redis.blmove, self.redis.set
+        failures = {"blmove": 2, "set": 2}
+        calls = {"blmove": 0, "set": 0}
+
+        def flaky(name, fn):
+            async def call(*args, **kwargs):
+                calls[name] += 1
+                # work() sets the first heartbeat itself, the heartbeat loop only from the second call on.
+                if failures[name] and (name != "set" or calls[name] > 1):
+                    failures[name] -= 1
+                    raise ConnectionError("redis restarting")
+                return await fn(*args, **kwargs)
+            return call
+
+        self.redis.blmove = flaky("blmove", blmove)
+        self.redis.set = flaky("set", set_)
+        await self.queue.enqueue("record", 1)
+
+        async def done():
+            return len(self.calls) == 1
+
+        await self.run_worker(done, concurrency=1)
+        self.assertEqual(self.calls, [((1,), {})])
+        self.assertEqual(failures, {"blmove": 0, "set": 0})
+
+    def flaky_finish(self, fail_before: int, fail_after: int):
+        finish = self.queue._finish_script
+        failures = {"before": fail_before, "after": fail_after}
+
+        async def call(*args, **kwargs):
+            if failures["before"]:
+                failures["before"] -= 1
+                raise ConnectionError("redis restarting")
+            result = await finish(*args, **kwargs)
+            if failures["after"]:
+                failures["after"] -= 1
+                raise ConnectionError("reply lost")
+            return result
+
+        self.queue.retry_delay = 0.01
+        self.queue._finish_script = call
+        return failures
+
+    async def test_job_is_finished_after_redis_errors(self):
+        failures = self.flaky_finish(fail_before=2, fail_after=0)
+        await self.queue.enqueue("record", 1)
+
+        async def finished():
+            return (await self.queue.stats()).get("succeeded") == 1
+
+        await self.run_worker(finished, concurrency=1)
+        self.assertEqual(failures, {"before": 0, "after": 0})
+        self.assertEqual(self.calls, [((1,), {})])
+        self.assertEqual([key async for key in self.redis.scan_iter(match="test:processing:*")], [])
+
+    async def test_lost_finish_reply_is_not_recorded_twice(self):
+        failures = self.flaky_finish(fail_before=0, fail_after=1)
+
+        async def broken():
+            raise RuntimeError("smtp down")
+
+        self.queue.register("broken", broken)
+        self.queue.backoff = 100
+        await self.queue.enqueue("broken")
+
+        async def delayed():
+            return await self.redis.zcard(self.queue.delayed) == 1 and not failures["after"]
+
+        await self.run_worker(delayed, concurrency=1)
+        stats = await self.queue.stats()
+        self.assertEqual((stats["retried"], stats["delayed"], stats["ready"]), (1, 1, 0))
+        self.assertEqual([key async for key in self.redis.scan_iter(match="test:processing:*")], [])
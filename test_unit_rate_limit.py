@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import AsyncMock
+
+from fastapi import HTTPException, Response
+from redis.exceptions import ConnectionError
+
+from src.services.rate_limit import RateLimit, RateLimiter, parse_limit
+
+try:
+    import lupa
+    from fakeredis import FakeAsyncRedis
+except ImportError:
+    FakeAsyncRedis = None
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestParseLimit(unittest.TestCase):
+
+    def test_parse_limit(self):
+        self.assertEqual(parse_limit("5/minute"), (5 / 60, 5))
+        self.assertEqual(parse_limit("10/second"), (10.0, 10))
+
+
+@unittest.skipIf(FakeAsyncRedis is None, "fakeredis with lupa is not installed")
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = FakeAsyncRedis()
+        self.clock = Clock()
+        self.limiter = RateLimiter(self.redis, local_size=2, clock=self.clock)
+
+    async def asyncTearDown(self):
+        await self.redis.flushall()
+        await self.redis.aclose()
+
+    async def test_bucket_allows_capacity_then_rejects(self):
+        results = [await self.limiter.hit("login:ip:1", 1 / 60, 3) for _ in range(4)]
+        self.assertEqual([wait for wait, _ in results[:3]], [0.0, 0.0, 0.0])
+        self.assertEqual([int(tokens) for _, tokens in results[:3]], [2, 1, 0])
+        self.assertAlmostEqual(results[3][0], 60, delta=1)
+        self.assertEqual(self.limiter.stats()["rejected"], 1)
+
+    async def test_buckets_are_separate_per_key(self):
+        await self.limiter.hit("login:ip:1", 1 / 60, 1)
+        wait, _ = await self.limiter.hit("login:ip:2", 1 / 60, 1)
+        self.assertEqual(wait, 0.0)
+
+    async def test_rejected_key_is_blocked_locally(self):
+        await self.limiter.hit("k", 1 / 60, 1)
+        await self.limiter.hit("k", 1 / 60, 1)
+        self.limiter.script = AsyncMock()
+        self.clock.now += 30
+        wait, _ = await self.limiter.hit("k", 1 / 60, 1)
+        self.assertAlmostEqual(wait, 30, delta=1)
+        self.limiter.script.assert_not_awaited()
+        self.assertEqual(self.limiter.stats()["rejected_locally"], 1)
+
+    async def test_local_block_expires(self):
+        await self.limiter.hit("k", 1 / 60, 1)
+        await self.limiter.hit("k", 1 / 60, 1)
+        self.limiter.script = AsyncMock(return_value=[1, b"0", b"0"])
+        self.clock.now += 61
+        self.assertEqual(await self.limiter.hit("k", 1 / 60, 1), (0.0, 0.0))
+        self.limiter.script.assert_awaited_once()
+
+    async def test_redis_errors_let_requests_through(self):
+        self.limiter.script = AsyncMock(side_effect=ConnectionError("down"))
+        self.assertEqual(await self.limiter.hit("k", 1, 5), (0.0, 5.0))
+        self.assertEqual(self.limiter.stats()["errors"], 1)
+
+    async def test_dependency_raises_429_with_retry_after(self):
+        limit = RateLimit("login", self.limiter)
+        limit.rate, limit.capacity = 1 / 60, 1
+        response = Response()
+        await limit.check("ip:1", response)
+        self.assertEqual(response.headers["X-RateLimit-Remaining"], "0")
+        with self.assertRaises(HTTPException) as e:
+            await limit.check("ip:1", Response())
+        self.assertEqual(e.exception.status_code, 429)
+        self.assertEqual(e.exception.headers["Retry-After"], "60")
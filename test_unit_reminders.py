@@ -0,0 +1,149 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.db.db import Base
+from src.db.models import BirthdayReminder, Contact, User
+from src.repository import reminders as repository_reminders
+from src.repository.reminders import birthday_days
+from src.conf.config import settings
+from src.services.reminders import seconds_until, send_daily_digests, send_until_done
+
+DAY = date(2025, 3, 11)
+
+
+class TestReminders(unittest.TestCase):
+
+    def test_birthday_days(self):
+        self.assertEqual(birthday_days(date(2025, 3, 11)), [311])
+
+    def test_leap_day_on_february_28(self):
+        self.assertEqual(birthday_days(date(2025, 2, 28)), [228, 229])
+        self.assertEqual(birthday_days(date(2024, 2, 28)), [228])
+        self.assertEqual(birthday_days(date(2024, 2, 29)), [229])
+
+    def test_seconds_until(self):
+        self.assertEqual(seconds_until(8, datetime(2025, 3, 11, 7, 30)), 1800)
+        self.assertEqual(seconds_until(8, datetime(2025, 3, 11, 8, 0)), 24 * 3600)
+
+
+
+class TestDigestDelivery(unittest.IsolatedAsyncioTestCase):
+
+    """
+    Claims and digest runs on SQLite. A file database is used because the
+    digest run opens several sessions at once.
+    """
+
+    async def asyncSetUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(self.dir.name, 'reminders.db')}")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User), [{"id": id, "username": f"user{id}", "email": f"user{id}@example.com",
+                                               "password": "x", "confirmed": True} for id in (1, 2, 3)])
+            await conn.execute(insert(Contact), [
+                {"name": "Ivan", "lastname": "Ivanoff", "email": f"ivan{id}@example.com", "phone": f"+38050000000{id}",
+                 "birthday": date(1990, 3, 11), "birthday_md": 311, "user_id": id} for id in (1, 2, 3)])
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.db = self.Session()
+        for target in ("src.repository.reminders.AsyncSessionLocal", "src.services.reminders.AsyncSessionLocal"):
+            session = patch(target, self.Session)
+            session.start()
+            self.addCleanup(session.stop)
+        send = patch("src.services.reminders.send_birthday_digest", AsyncMock())
+        self.send = send.start()
+        self.addCleanup(send.stop)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+        self.dir.cleanup()
+
+    async def claim(self, user_id: int = 1, stale_after: int = 600) -> bool:
+        return await repository_reminders.claim(user_id, DAY, stale_after, self.db)
+
+    async def statuses(self) -> dict:
+        result = await self.db.execute(select(BirthdayReminder.user_id, BirthdayReminder.status))
+        return dict(result.all())
+
+    async def test_second_claim_on_the_same_day_is_denied(self):
+        self.assertTrue(await self.claim())
+        self.assertFalse(await self.claim())
+        self.assertTrue(await repository_reminders.claim(1, DAY + timedelta(days=1), 600, self.db))
+
+    async def test_failed_reminder_can_be_claimed_again(self):
+        await self.claim()
+        await repository_reminders.set_status(1, DAY, "failed", self.db)
+        self.assertTrue(await self.claim())
+
+    async def test_stale_pending_reminder_can_be_claimed_again(self):
+        await self.claim()
+        self.assertFalse(await self.claim(stale_after=600))
+        await self.db.execute(update(BirthdayReminder).values(claimed_at=datetime.now() - timedelta(seconds=601)))
+        await self.db.commit()
+        self.assertTrue(await self.claim(stale_after=600))
+
+    async def test_sent_reminder_is_never_claimed_again(self):
+        await self.claim()
+        await repository_reminders.set_status(1, DAY, "sent", self.db)
+        await self.db.execute(update(BirthdayReminder).values(claimed_at=datetime.now() - timedelta(days=1)))
+        await self.db.commit()
+        self.assertFalse(await self.claim(stale_after=600))
+
+    async def test_rerun_skips_sent_digests(self):
+        self.assertEqual(await send_daily_digests(DAY), {"sent": 3, "skipped": 0, "failed": 0})
+        self.assertEqual(await self.statuses(), {1: "sent", 2: "sent", 3: "sent"})
+        self.assertEqual(await send_daily_digests(DAY), {"sent": 0, "skipped": 3, "failed": 0})
+        self.assertEqual(self.send.await_count, 3)
+
+    async def test_failed_digest_is_retried_on_the_next_run(self):
+        self.send.side_effect = [None, ConnectionError("smtp down"), None]
+        self.assertEqual(await send_daily_digests(DAY, concurrency=1), {"sent": 2, "skipped": 0, "failed": 1})
+        self.assertEqual(sorted((await self.statuses()).values()), ["failed", "sent", "sent"])
+        self.send.side_effect = None
+        self.assertEqual(await send_daily_digests(DAY), {"sent": 1, "skipped": 2, "failed": 0})
+
+    async def test_status_error_does_not_cancel_other_digests(self):
+        set_status = repository_reminders.set_status
+        calls = []
+
+        async def flaky_set_status(user_id, day, status, db):
+            calls.append(user_id)
+            if user_id == 1:
+                raise ConnectionError("db down")
+            await set_status(user_id, day, status, db)
+
+        with patch("src.repository.reminders.set_status", flaky_set_status):
+            self.assertEqual(await send_daily_digests(DAY), {"sent": 3, "skipped": 0, "failed": 0})
+        self.assertEqual(sorted(calls), [1, 2, 3])
+        self.assertEqual(await self.statuses(), {1: "pending", 2: "sent", 3: "sent"})
+
+
+    async def test_restart_finishes_a_partial_run(self):
+        # The crashed run sent user 1's digest, failed user 2's and died while sending user 3's.
+        for user_id, status in ((1, "sent"), (2, "failed"), (3, None)):
+            await self.claim(user_id)
+            if status:
+                await repository_reminders.set_status(user_id, DAY, status, self.db)
+        with patch.object(settings, "reminder_stale_after", 0.2):
+            unsent = await send_until_done(DAY, 0, 1, datetime.now() + timedelta(seconds=10), retry_delay=0.05)
+        self.assertEqual(unsent, 0)
+        self.assertEqual(await self.statuses(), {1: "sent", 2: "sent", 3: "sent"})
+        self.assertEqual(sorted(call.args[0] for call in self.send.await_args_list),
+                         ["user2@example.com", "user3@example.com"])
+
+    async def test_retries_stop_at_the_deadline(self):
+        self.send.side_effect = ConnectionError("smtp down")
+        unsent = await send_until_done(DAY, 0, 1, datetime.now() + timedelta(seconds=0.3), retry_delay=0.05)
+        self.assertEqual(unsent, 3)
+        self.assertGreater(self.send.await_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
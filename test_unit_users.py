@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.db.db import Base
+from src.db.models import User
+from src.repository.users import confirmed_email, create_user, gravatar_url, update_token
+from src.schemas import UserModel
+
+
+class TestCreateUser(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.body = UserModel(username="ivanoff", email="ivanoff@example.com", password="hashed")
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    def test_gravatar_url(self):
+        self.assertEqual(gravatar_url(" Foo@Bar.com "),
+                         "https://www.gravatar.com/avatar/f3ada405ce890b6f8204094deb12d8a8")
+
+    async def test_create_user_returns_new_row(self):
+        user = await create_user(self.body, self.session)
+        self.assertIsNotNone(user.id)
+        self.assertEqual(user.email, "ivanoff@example.com")
+        self.assertEqual(user.avatar, gravatar_url("ivanoff@example.com"))
+        self.assertFalse(user.confirmed)
+        self.assertIsNotNone(user.created_at)
+
+    async def test_create_user_with_taken_email_returns_none(self):
+        await create_user(self.body, self.session)
+        self.assertIsNone(await create_user(self.body, self.session))
+        self.assertEqual(await self.session.scalar(select(func.count()).select_from(User)), 1)
+
+    async def test_only_cached_fields_invalidate_the_user_cache(self):
+        user = await create_user(self.body, self.session)
+        with patch("src.repository.users.user_cache.invalidate", AsyncMock()) as invalidate:
+            await update_token(user, "refresh", self.session)
+            invalidate.assert_not_awaited()
+            await confirmed_email(user.email, self.session)
+            invalidate.assert_awaited_once_with(user.email)
+        self.assertEqual((user.refresh_token, user.confirmed), ("refresh", True))